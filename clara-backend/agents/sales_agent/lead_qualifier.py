@@ -8,7 +8,7 @@ from openai import OpenAI
 from groq import Groq
 from utils.logger import get_logger
 from config import get_api_key, get_agent_model
-from .prompts import LEAD_QUALIFICATION_PROMPT
+from .prompts import build_lead_qualification_prompt
 
 logger = get_logger("lead_qualifier")
 
@@ -57,7 +57,7 @@ class LeadQualifier:
             conversation_text = self._format_conversation(conversation_history)
             
             # Build prompt
-            prompt = LEAD_QUALIFICATION_PROMPT.format(
+            prompt = build_lead_qualification_prompt(
                 conversation_history=conversation_text,
                 latest_message=latest_message
             )
@@ -2,6 +2,8 @@
 Sales Agent Prompts - LLM prompts for sales interactions
 """
 
+from functools import lru_cache
+
 SALES_AGENT_SYSTEM_PROMPT = """You are Clara, a professional AI sales assistant. Your role is to:
 
 1. **Qualify Leads**: Gather information about potential customers
@@ -139,6 +141,42 @@ Provide your scoring as JSON:
 }"""
 
 
+
+# ─────────────────────────────────────────────────────────────────────────
+# Pre-split templates
+# ─────────────────────────────────────────────────────────────────────────
+# The qualification prompt above is ~2KB and is filled on every
+# qualification turn. Splitting it once at import lets callers join the
+# pieces directly instead of re-parsing the whole template with str.format()
+# each time.
+
+def _split_template(template: str, *fields: str) -> tuple:
+    """Split `template` around each `{field}` (in order) and unescape `{{ }}`."""
+    pieces = []
+    rest = template
+    for field in fields:
+        head, rest = rest.split("{" + field + "}", 1)
+        pieces.append(head)
+    pieces.append(rest)
+    return tuple(p.replace("{{", "{").replace("}}", "}") for p in pieces)
+
+
+_LEAD_QUAL_PREFIX, _LEAD_QUAL_MIDDLE, _LEAD_QUAL_SUFFIX = _split_template(
+    LEAD_QUALIFICATION_PROMPT, "conversation_history", "latest_message"
+)
+
+
+def build_lead_qualification_prompt(conversation_history: str, latest_message: str) -> str:
+    """Fill LEAD_QUALIFICATION_PROMPT (same result as .format())."""
+    return "".join((
+        _LEAD_QUAL_PREFIX,
+        conversation_history,
+        _LEAD_QUAL_MIDDLE,
+        latest_message,
+        _LEAD_QUAL_SUFFIX,
+    ))
+
+
 FOLLOW_UP_SUGGESTION_PROMPT = """Based on this lead's status and conversation, suggest appropriate follow-up actions.
 
 Lead Status: {lead_status}
@@ -176,6 +214,38 @@ Provide a response that:
 Keep the response natural, empathetic, and solution-focused. Don't be defensive."""
 
 
+@lru_cache(maxsize=256)
+def _build_context_addition(lead_items: tuple, company_context: str) -> str:
+    """Render the lead/company block (cached: lead_info rarely changes between turns)."""
+    parts = []
+
+    if lead_items:
+        parts.append("\n\n## Current Lead Information:\n")
+        for key, value in lead_items:
+            if value:
+                parts.append(f"- {key}: {value}\n")
+
+    if company_context:
+        parts.append(f"\n\n## Company/Product Context:\n{company_context}")
+
+    return "".join(parts)
+
+
+def get_sales_context_addition(lead_info: dict, company_context: str = "") -> str:
+    """
+    Per-conversation block appended after SALES_AGENT_SYSTEM_PROMPT
+
+    Kept separate so the static system prompt stays a byte-identical prefix
+    on every call, which is what provider-side prompt caching matches on.
+    """
+    lead_items = tuple((lead_info or {}).items())
+    try:
+        return _build_context_addition(lead_items, company_context)
+    except TypeError:
+        # Unhashable values (lists/dicts) - build without the cache
+        return _build_context_addition.__wrapped__(lead_items, company_context)
+
+
 def get_sales_prompt_with_context(
     lead_info: dict,
     conversation_history: list,
@@ -190,18 +260,6 @@ def get_sales_prompt_with_context(
         company_context: Information about your company/product
         
     Returns:
-        Contextualized system prompt
+        Contextualized system prompt (static prefix + context block)
     """
-    context_addition = ""
-    
-    if lead_info:
-        context_addition += f"\n\n## Current Lead Information:\n"
-        for key, value in lead_info.items():
-            if value:
-                context_addition += f"- {key}: {value}\n"
-    
-    if company_context:
-        context_addition += f"\n\n## Company/Product Context:\n{company_context}"
-    
-    return SALES_AGENT_SYSTEM_PROMPT + context_addition
-
+    return SALES_AGENT_SYSTEM_PROMPT + get_sales_context_addition(lead_info, company_context)
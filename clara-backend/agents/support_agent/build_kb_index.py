@@ -2,102 +2,217 @@
 Build Knowledge Base Index (Phase 2B.2)
 
 This script:
-- Reads published articles from `kb_articles`
-- Splits each article into smaller text chunks
-- Uses `all-MiniLM-L12-v2` to create embeddings for each chunk
-- Stores chunks in `kb_chunks` and `kb_embeddings`
+- Reads published articles from `kb_articles` (in batches of 200)
+- Splits each article into overlapping chunks of ~120 model tokens
+- Uses `all-MiniLM-L12-v2` (loaded by kb_search.get_model) to create
+  embeddings for each chunk
+- Stores chunks in `kb_chunks` and `kb_embeddings`:
+  - `embedding`: normalized float vector, searched by pgvector in the database
+  - `embedding_int8` + `embedding_scale`: int8 copy with a per-vector scale
+    (384 bytes instead of ~8KB of JSON floats) for the in-process search
+    fallback
+  - `embedding_bits`: sign bits packed into 48 bytes, used by the fallback
+    to shortlist candidates before rescoring
+- Publishes the fallback's int8 index as one object in Supabase Storage
+  (`kb-index/kb_embeddings.npz`), so API workers load it in one download
+
+Requires the columns/functions from database/kb_search_optimizations.sql.
 
 Run from clara-backend folder:
     python -m agents.support_agent.build_kb_index
 """
 
+import hashlib
 import os
-from typing import List, Dict, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
+from threading import BoundedSemaphore
+from typing import Dict, Iterator, List, Tuple
 
 # IMPORTANT: tell transformers / sentence-transformers to use ONLY PyTorch
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 os.environ["USE_TF"] = "0"
 
 from dotenv import load_dotenv
-import torch
-from sentence_transformers import SentenceTransformer
-from supabase import create_client, Client
+import numpy as np
+from supabase import Client
+
+from utils.postgrest import is_missing_function
+from utils.torch_threads import configure_inference_threads
+from .db import get_supabase
+from .kb_search import (
+    EMBED_MODEL_NAME,
+    INT8_SCALE,
+    KB_INDEX_BUCKET,
+    KB_INDEX_OBJECT,
+    get_model,
+    publish_embedding_index,
+)
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+# Offline batch job: use every core (kb_search caps threads for the API)
+configure_inference_threads(os.cpu_count())
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+supabase: Client = get_supabase()
+
+if supabase is None:
     raise RuntimeError("Supabase credentials not found in environment")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Articles fetched per request while indexing
+ARTICLE_BATCH_SIZE = 200
 
-# Embedding model (384-dim, good quality)
-EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L12-v2"
-_model: SentenceTransformer | None = None
+# Threads inserting chunks/embeddings while the main thread keeps encoding
+INSERT_WORKERS = 8
 
+# chunk-text hash -> (embedding, int8 embedding, scale), shared across
+# articles. Capped (~20MB) so memory stays bounded on very large KBs.
+EMBED_CACHE_MAX_ENTRIES = 10_000
+_embedding_cache: Dict[bytes, Tuple[np.ndarray, np.ndarray, float]] = {}
 
-def get_model() -> SentenceTransformer:
-    """Load the sentence-transformer model once (CPU or GPU)."""
-    global _model
-    if _model is None:
-        # Use GPU only if PyTorch reports that CUDA is actually available
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        _model = SentenceTransformer(EMBED_MODEL_NAME, device=device)
-    return _model
 
+def iter_published_articles(batch_size: int = ARTICLE_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Yield published kb_articles from Supabase in batches.
 
-def fetch_published_articles() -> List[Dict]:
-    """Fetch published kb_articles from Supabase."""
-    res = supabase.table("kb_articles").select("id, title, content, state").eq("state", "published").execute()
-    return res.data or []
+    Uses keyset pagination on `id` so only one batch of article content is
+    held in memory at a time, however large the KB grows.
+    """
+    cursor = None
+    while True:
+        query = (
+            supabase.table("kb_articles")
+            .select("id, title, content")
+            .eq("state", "published")
+            .order("id")
+            .limit(batch_size)
+        )
+        if cursor is not None:
+            query = query.gt("id", cursor)
+
+        batch = query.execute().data or []
+        if not batch:
+            return
+
+        yield batch
+
+        if len(batch) < batch_size:
+            return
+        cursor = batch[-1]["id"]
+
+
+# Chunk size is measured in model tokens. all-MiniLM-L12-v2 truncates
+# inputs at 128 tokens (including [CLS]/[SEP]), so longer chunks would only
+# be partly embedded.
+CHUNK_TOKENS = 120
+CHUNK_OVERLAP_TOKENS = 24
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_OVERLAP_TOKENS,
+) -> List[str]:
+    """Split long article text into overlapping chunks.
+
+    - Tokenize with the embedding model's own tokenizer
+    - Slide a window of `max_tokens` tokens, moving `max_tokens - overlap`
+      tokens each step, so text cut at one boundary is whole in the next chunk
+    - Map each window back to the original text through the token offsets,
+      keeping the article's casing and formatting
+    """
 
+    tokenizer = get_model().tokenizer
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        verbose=False,
+    )
+    offsets = encoding["offset_mapping"]
 
-def split_into_chunks(text: str, max_chars: int = 600) -> List[str]:
-    """Split long article text into smaller chunks.
+    chunks: List[str] = []
+    stride = max_tokens - overlap
 
-    We keep this logic very simple and easy to understand:
-    - First split by blank lines (paragraphs)
-    - Then group paragraphs together until we reach ~max_chars
-    """
+    for start in range(0, len(offsets), stride):
+        window = offsets[start:start + max_tokens]
+        chunk = text[window[0][0]:window[-1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
 
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-    chunks: List[str] = []
-    current = ""
+        if start + max_tokens >= len(offsets):
+            break
 
-    for para in paragraphs:
-        if not current:
-            current = para
-            continue
+    return chunks
 
-        # If adding the next paragraph would make the chunk too long,
-        # start a new chunk.
-        if len(current) + 2 + len(para) > max_chars:
-            chunks.append(current)
-            current = para
-        else:
-            current = current + "\n\n" + para
 
-    if current:
-        chunks.append(current)
+def quantize_embeddings(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Scalar-quantize float embeddings (N x D) to int8 with one scale per row.
 
-    return chunks
+    Returns (codes, scales) where embeddings ~= codes * scales[:, None].
+    A per-vector scale uses the full int8 range for every vector, which
+    keeps more precision than one global scale.
+    """
+    scales = np.abs(embeddings).max(axis=1) / INT8_SCALE
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.round(embeddings / scales[:, None]), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+    return codes, scales.astype(np.float32)
 
 
-def embed_chunks(article_id: str, chunks: List[str]) -> None:
-    """Store chunks + embeddings for a single article."""
+def to_bytea_hex(vec: np.ndarray) -> str:
+    """Encode a vector's raw bytes as a Postgres bytea hex literal.
+
+    PostgREST accepts (and returns) bytea columns in this `\\x...` form.
+    """
+    return "\\x" + vec.tobytes().hex()
 
-    if not chunks:
-        return
 
-    model = get_model()
+def _chunk_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
 
-    # Compute embeddings (returns a list of 384-dim vectors)
-    embeddings = model.encode(chunks, show_progress_bar=False).tolist()
+
+def encode_chunks(chunks: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute normalized embeddings (N x 384) and their int8 quantization.
+
+    Articles often share boilerplate ("contact support" footers etc.), so
+    embeddings are remembered by chunk-text hash and each distinct text is
+    encoded once per run.
+    """
+    keys = [_chunk_key(c) for c in chunks]
+
+    found: Dict[bytes, Tuple[np.ndarray, np.ndarray, float]] = {}
+    missing: Dict[bytes, str] = {}
+    for key, chunk in zip(keys, chunks):
+        if key in _embedding_cache:
+            found[key] = _embedding_cache[key]
+        elif key not in missing:
+            missing[key] = chunk
+
+    if missing:
+        model = get_model()
+        embeddings = model.encode(list(missing.values()), show_progress_bar=False, normalize_embeddings=True)
+        codes, scales = quantize_embeddings(embeddings)
+        for key, emb, emb_int8, scale in zip(missing, embeddings, codes, scales):
+            found[key] = (emb, emb_int8, float(scale))
+            if len(_embedding_cache) < EMBED_CACHE_MAX_ENTRIES:
+                _embedding_cache[key] = found[key]
+
+    embeddings = np.stack([found[k][0] for k in keys])
+    codes = np.stack([found[k][1] for k in keys])
+    scales = np.array([found[k][2] for k in keys], dtype=np.float32)
+    return embeddings, codes, scales
+
+
+def store_chunks(
+    article_id: str,
+    chunks: List[str],
+    embeddings: np.ndarray,
+    codes: np.ndarray,
+    scales: np.ndarray,
+) -> None:
+    """Store chunks + embeddings for a single article."""
 
     # Insert chunks and embeddings one by one (simple, clear logic)
-    for order_idx, (chunk_text, emb) in enumerate(zip(chunks, embeddings)):
+    for order_idx, (chunk_text, emb, emb_int8, scale) in enumerate(zip(chunks, embeddings, codes, scales)):
         chunk_payload = {
             "article_id": article_id,
             "content": chunk_text,
@@ -112,7 +227,10 @@ def embed_chunks(article_id: str, chunks: List[str]) -> None:
 
         embed_payload = {
             "chunk_id": chunk_id,
-            "embedding": emb,
+            "embedding": emb.tolist(),
+            "embedding_int8": to_bytea_hex(emb_int8),
+            "embedding_scale": float(scale),
+            "embedding_bits": to_bytea_hex(np.packbits(emb > 0)),
             "model": EMBED_MODEL_NAME,
         }
         supabase.table("kb_embeddings").insert(embed_payload).execute()
@@ -122,18 +240,29 @@ def clear_existing_index() -> None:
     """Optional: clear old chunks + embeddings before rebuilding.
 
     We call this once at the beginning so the index matches current articles.
+    The kb_reset_index() RPC truncates kb_embeddings instead of deleting
+    row by row; only if that function is not installed do we fall back to
+    plain deletes. Any other failure is raised.
     """
 
+    try:
+        supabase.rpc("kb_reset_index").execute()
+        return
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        print("kb_reset_index() not installed; deleting old index rows one by one")
+
     supabase.table("kb_embeddings").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
     supabase.table("kb_chunks").delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
 
 
 def main() -> None:
     print("Fetching published articles...")
-    articles = fetch_published_articles()
-    print(f"Found {len(articles)} articles.")
+    batches = iter_published_articles()
+    first_batch = next(batches, [])
 
-    if not articles:
+    if not first_batch:
         print("No published kb_articles found. Run seed_kb_faqs first.")
         return
 
@@ -143,17 +272,51 @@ def main() -> None:
     processed_articles = 0
     total_chunks = 0
 
-    for art in articles:
-        article_id = art["id"]
-        title = art.get("title", "(no title)")
-        content = art.get("content") or ""
-
-        chunks = split_into_chunks(content)
-        embed_chunks(article_id, chunks)
-
-        processed_articles += 1
-        total_chunks += len(chunks)
-        print(f"Indexed '{title}' with {len(chunks)} chunks.")
+    # Encoding runs on this thread while earlier articles are inserted by the
+    # pool, so the CPU is not idle during network round trips. The semaphore
+    # caps how many encoded articles can wait for a free insert worker.
+    in_flight = BoundedSemaphore(INSERT_WORKERS * 2)
+    pending: List[Future] = []
+
+    def store_and_release(article_id, chunks, embeddings, codes, scales, title):
+        try:
+            store_chunks(article_id, chunks, embeddings, codes, scales)
+            print(f"Indexed '{title}' with {len(chunks)} chunks.")
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=INSERT_WORKERS) as pool:
+        for batch in chain([first_batch], batches):
+            print(f"Processing batch of {len(batch)} articles...")
+            for art in batch:
+                article_id = art["id"]
+                title = art.get("title", "(no title)")
+                content = art.get("content") or ""
+
+                chunks = split_into_chunks(content)
+                processed_articles += 1
+                total_chunks += len(chunks)
+                if not chunks:
+                    continue
+
+                embeddings, codes, scales = encode_chunks(chunks)
+
+                in_flight.acquire()
+                pending.append(
+                    pool.submit(store_and_release, article_id, chunks, embeddings, codes, scales, title)
+                )
+
+        # Surface the first insert error, if any
+        for future in pending:
+            future.result()
+
+    print("Publishing embedding index to Supabase Storage...")
+    try:
+        n_vectors = publish_embedding_index()
+        print(f"Published {n_vectors} vectors to {KB_INDEX_BUCKET}/{KB_INDEX_OBJECT}.")
+    except Exception as e:
+        # Search still works; workers will download the rows instead
+        print(f"Could not publish embedding index: {e}")
 
     print(f"Done. Processed {processed_articles} articles and created {total_chunks} chunks.")
 
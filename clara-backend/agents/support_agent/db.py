@@ -0,0 +1,42 @@
+"""
+Shared Supabase client for the Support Agent
+
+kb_api, kb_search, ticket_api and the KB scripts all use the same project
+with the SERVICE_ROLE key. One client per process means one HTTP
+connection pool, instead of a separate pool (and TLS handshakes) per module.
+"""
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from utils.http_client import client_options
+
+load_dotenv()
+
+# Connection pool shared by every PostgREST / Storage call. ticket_api runs
+# queries from worker threads, so many can be in flight at once: keep
+# connections warm between requests and cap how many we open upstream.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60.0)
+
+# Storage transfers (the KB index file) need longer than a normal query
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Optional[Client]:
+    """Return the process-wide Supabase client, or None if credentials are missing."""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+
+    if not url or not key:
+        return None
+
+    options = client_options(HTTP_LIMITS, HTTP_TIMEOUT)
+    if options is None:
+        return create_client(url, key)
+    return create_client(url, key, options=options)
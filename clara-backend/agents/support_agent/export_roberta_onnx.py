@@ -0,0 +1,79 @@
+"""
+Export the RoBERTa ticket classifier to ONNX with int8 weights (Phase 2A)
+
+This script:
+- Loads the fine-tuned model from models/roberta_ticket_category
+- Exports it to ONNX (dynamic batch and sequence length)
+- Applies dynamic int8 quantization to the weight matrices
+- Saves models/roberta_ticket_category/onnx/model_int8.onnx
+
+roberta_classifier uses this file automatically on CPU (it is typically
+2-4x faster than the PyTorch FP32 model, using VNNI on modern x86).
+
+Run from the clara-backend folder, after train_roberta_classifier:
+    python -m agents.support_agent.export_roberta_onnx
+
+Requirements:
+- torch
+- transformers
+- onnx
+- onnxruntime
+"""
+
+import os
+
+# IMPORTANT: tell transformers to use ONLY PyTorch (no TensorFlow)
+os.environ["TRANSFORMERS_NO_TF"] = "1"
+os.environ["USE_TF"] = "0"
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from .roberta_classifier import MODEL_DIR, ONNX_MODEL_PATH
+
+ONNX_FP32_PATH = os.path.join(MODEL_DIR, "onnx", "model.onnx")
+
+
+def main() -> None:
+    if not os.path.isdir(MODEL_DIR):
+        raise RuntimeError(f"RoBERTa model directory not found: {MODEL_DIR}")
+
+    print(f"Loading model from {MODEL_DIR}...")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
+    model.eval()
+
+    # Return plain tuples so the traced graph has a single `logits` output
+    model.config.return_dict = False
+
+    dummy = tokenizer("Example ticket text", return_tensors="pt")
+
+    os.makedirs(os.path.dirname(ONNX_FP32_PATH), exist_ok=True)
+
+    print("Exporting to ONNX...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            ONNX_FP32_PATH,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=17,
+        )
+
+    print("Quantizing weights to int8...")
+    quantize_dynamic(ONNX_FP32_PATH, ONNX_MODEL_PATH, weight_type=QuantType.QInt8)
+
+    fp32_mb = os.path.getsize(ONNX_FP32_PATH) / 1e6
+    int8_mb = os.path.getsize(ONNX_MODEL_PATH) / 1e6
+    print(f"Done. {ONNX_FP32_PATH} ({fp32_mb:.0f} MB) -> {ONNX_MODEL_PATH} ({int8_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,44 @@ Knowledge Base API - Support Agent
 Husnain's Implementation
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import os
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from .kb_search import search_kb
-
-load_dotenv()
+from supabase import Client
+from utils.ttl_cache import TTLCache
+from .db import get_supabase
+from .kb_search import hybrid_search_kb, search_kb
 
 router = APIRouter(prefix="/api/kb", tags=["Knowledge Base"])
 
 # Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+supabase: Client | None = get_supabase()
+
+# Categories and stats change only when articles are added or re-indexed,
+# but dashboards poll them constantly. Serve them from memory for a minute.
+KB_SUMMARY_CACHE_TTL_SECONDS = 60
+_summary_cache = TTLCache(maxsize=4, ttl=KB_SUMMARY_CACHE_TTL_SECONDS)
 
-if supabase_url and supabase_key:
-    supabase: Client = create_client(supabase_url, supabase_key)
-else:
-    supabase = None
+# Keyword fallback search: words that never help narrow the match
+STOPWORDS = frozenset({
+    "the", "a", "an", "in", "on", "to", "of", "and", "or", "is", "are",
+    "how", "do", "does", "can", "i", "my", "me", "you", "your", "it",
+    "for", "with", "what", "why", "when", "not",
+})
+ILIKE_MAX_TERMS = 5
 
 
 # ─────────────────────────────────────────────────────────────────────────
 # PYDANTIC MODELS
 # ─────────────────────────────────────────────────────────────────────────
 
+# Columns backing KBArticle. Avoid select("*"): kb_articles also carries
+# summary/tags and the generated full-text `fts` column, none of which the
+# API returns.
+KB_ARTICLE_LIST_COLUMNS = "id, title, category, state, view_count, helpful_count, created_at, updated_at"
+KB_ARTICLE_COLUMNS = KB_ARTICLE_LIST_COLUMNS + ", content"
+
+
 class KBArticle(BaseModel):
     id: str
     title: str
@@ -57,22 +70,120 @@ class KBSearchResult(BaseModel):
     article_category: Optional[str]
 
 
+# ─────────────────────────────────────────────────────────────────────────
+# HELPER FUNCTIONS
+# ─────────────────────────────────────────────────────────────────────────
+
+def _fts_search_articles(q: str, top_k: int) -> List[dict]:
+    """Rank articles with Postgres full-text search (GIN index on kb_articles.fts)."""
+    response = supabase.rpc("kb_fts_search", {"q": q, "k": top_k}).execute()
+    return response.data or []
+
+
+def _category_counts() -> dict:
+    """Return {category: article count}, aggregated in Postgres when possible."""
+    try:
+        response = supabase.rpc("kb_category_counts").execute()
+        return {row["category"]: row["n"] for row in response.data or []}
+    except Exception:
+        # kb_category_counts RPC not installed yet: count in Python
+        pass
+
+    response = supabase.table("kb_articles").select("category").execute()
+
+    categories_count = {}
+    for a in response.data or []:
+        cat = a.get("category") or "general"
+        categories_count[cat] = categories_count.get(cat, 0) + 1
+    return categories_count
+
+
+def _kb_counts() -> tuple[int, int]:
+    """Return (total articles, total chunks) in one round trip when possible."""
+    try:
+        response = supabase.rpc("kb_stats").execute()
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        return int(row["articles_count"] or 0), int(row["chunks_count"] or 0)
+    except Exception:
+        # kb_stats RPC not installed yet: two count queries
+        pass
+
+    articles_res = supabase.table("kb_articles").select("id", count="exact").execute()
+    chunks_res = supabase.table("kb_chunks").select("id", count="exact").execute()
+    return articles_res.count or 0, chunks_res.count or 0
+
+
+def _search_terms(q: str) -> List[str]:
+    """Pick at most ILIKE_MAX_TERMS distinct, lowercased keywords from a query.
+
+    Every term adds two ILIKE clauses (title + content), each a full scan, so
+    stopwords and duplicates are dropped and the longest terms are kept.
+    """
+    words = dict.fromkeys(t.lower() for t in q.split())
+    terms = [t for t in words if len(t) >= 3 and t not in STOPWORDS]
+    if not terms:
+        stripped = q.strip().lower()
+        return [stripped] if stripped else []
+
+    terms.sort(key=len, reverse=True)
+    return terms[:ILIKE_MAX_TERMS]
+
+
+def _ilike_search_articles(q: str, top_k: int) -> List[dict]:
+    """Basic keyword search used when the full-text search RPC is missing.
+
+    ILIKE '%term%' cannot use an index, so this scans every article.
+    """
+    # Instead of matching the full phrase, we split into words so that
+    # queries like "password reset" still match content that contains
+    # "password" and/or "reset" separately.
+    terms = _search_terms(q)
+    if not terms:
+        return []
+
+    or_clauses: list[str] = []
+    for term in terms:
+        pattern = f"%{term}%"
+        or_clauses.append(f"title.ilike.{pattern}")
+        or_clauses.append(f"content.ilike.{pattern}")
+
+    or_expression = ",".join(or_clauses)
+
+    response = (
+        supabase
+        .table("kb_articles")
+        .select("id, title, content, category")
+        .or_(or_expression)
+        .limit(top_k)
+        .execute()
+    )
+
+    # We don't have a real similarity score here, so return a neutral 0.5
+    return [{**row, "score": 0.5} for row in response.data or []]
+
+
 # ─────────────────────────────────────────────────────────────────────────
 # API ENDPOINTS
 # ─────────────────────────────────────────────────────────────────────────
 
-@router.get("/articles", response_model=List[KBArticle])
+@router.get("/articles", response_model=List[KBArticle], response_class=ORJSONResponse)
 async def list_articles(
     category: Optional[str] = Query(None, description="Filter by category"),
     status: Optional[str] = Query("published", description="Filter by state"),
-    limit: int = Query(50, le=100, description="Number of articles")
+    limit: int = Query(50, le=100, description="Number of articles"),
+    include_content: bool = Query(True, description="Include full article content"),
 ):
-    """List knowledge base articles with optional filters"""
+    """List knowledge base articles with optional filters.
+
+    Pass include_content=false for list views that only render titles; the
+    content column is by far the largest part of the payload.
+    """
     if not supabase:
         raise HTTPException(500, "Database not configured")
     
     try:
-        query = supabase.table("kb_articles").select("*")
+        columns = KB_ARTICLE_COLUMNS if include_content else KB_ARTICLE_LIST_COLUMNS
+        query = supabase.table("kb_articles").select(columns)
         
         if category:
             query = query.eq("category", category)
@@ -111,7 +222,7 @@ async def get_article(article_id: str):
         raise HTTPException(500, "Database not configured")
     
     try:
-        response = supabase.table("kb_articles").select("*").eq("id", article_id).execute()
+        response = supabase.table("kb_articles").select(KB_ARTICLE_COLUMNS).eq("id", article_id).execute()
         
         if not response.data:
             raise HTTPException(404, "Article not found")
@@ -135,20 +246,18 @@ async def get_article(article_id: str):
         raise HTTPException(500, f"Error getting article: {str(e)}")
 
 
-@router.get("/categories", response_model=List[KBCategory])
+@router.get("/categories", response_model=List[KBCategory], response_class=ORJSONResponse)
 async def list_categories():
-    """List knowledge base categories"""
+    """List knowledge base categories (cached for KB_SUMMARY_CACHE_TTL_SECONDS)"""
     if not supabase:
         raise HTTPException(500, "Database not configured")
+
+    cached = _summary_cache.get("categories")
+    if cached is not None:
+        return cached
     
     try:
-        # Get unique categories from articles
-        response = supabase.table("kb_articles").select("category").execute()
-        
-        categories_count = {}
-        for a in response.data or []:
-            cat = a.get("category") or "general"
-            categories_count[cat] = categories_count.get(cat, 0) + 1
+        categories_count = _category_counts()
         
         categories = []
         for idx, (name, count) in enumerate(categories_count.items()):
@@ -161,13 +270,14 @@ async def list_categories():
                 is_active=True,
             ))
         
+        _summary_cache.set("categories", categories)
         return categories
         
     except Exception as e:
         raise HTTPException(500, f"Error listing categories: {str(e)}")
 
 
-@router.get("/search", response_model=List[KBSearchResult])
+@router.get("/search", response_model=List[KBSearchResult], response_class=ORJSONResponse)
 async def search_knowledge_base(
     q: str = Query(..., min_length=2, description="Search query"),
     top_k: int = Query(5, le=20, description="Number of results")
@@ -175,22 +285,29 @@ async def search_knowledge_base(
     """Search the knowledge base.
 
     Primary path:
-        - Use embedding-based semantic search via search_kb (kb_embeddings table).
-
-    Fallback path (when embeddings are not yet built or search_kb returns nothing):
-        - Do a simple ILIKE text search over kb_articles.title/content
+        - One kb_hybrid_search RPC: pgvector similarity + full-text rank over
+          kb_chunks, fused by reciprocal rank fusion.
+        - If that RPC is not installed, embedding-based semantic search via
+          search_kb (kb_embeddings table).
+
+    Fallback path (when embeddings are not yet built or nothing matched):
+        - Full-text search over kb_articles.title/content via the kb_fts_search RPC
+        - If that RPC is not installed, a simple ILIKE keyword scan
         - Still return KBSearchResult objects so the frontend continues to work.
     """
 
-    # First, try the embedding-based search helper
+    # First, try the hybrid search RPC, then the embedding-based search helper
     results = []
     try:
-        results = search_kb(q, top_k=top_k)
+        results = hybrid_search_kb(q, top_k=top_k)
     except Exception:
-        # If the embedding path fails for any reason, we fall back to SQL search below
-        results = []
+        try:
+            results = search_kb(q, top_k=top_k)
+        except Exception:
+            # If the embedding path fails for any reason, we fall back to SQL search below
+            results = []
 
-    # If we have embedding-based results, return them directly
+    # If we have chunk-level results, return them directly
     if results:
         return [
             KBSearchResult(
@@ -203,52 +320,27 @@ async def search_knowledge_base(
             for r in results
         ]
 
-    # ---------- Fallback: simple text search on kb_articles ----------
+    # ---------- Fallback: full-text search on kb_articles ----------
     if not supabase:
         raise HTTPException(500, "Database not configured")
 
     try:
-        # Use ILIKE on title and content for a basic keyword search.
-        # Instead of matching the full phrase, we split into words so that
-        # queries like "password reset" still match content that contains
-        # "password" and/or "reset" separately.
-
-        # Split query into simple terms (words), ignoring very short tokens
-        terms = [t.strip() for t in q.split() if len(t.strip()) >= 2]
-        if not terms:
-            terms = [q.strip()]
-
-        or_clauses: list[str] = []
-        for term in terms:
-            pattern = f"%{term}%"
-            or_clauses.append(f"title.ilike.{pattern}")
-            or_clauses.append(f"content.ilike.{pattern}")
-
-        or_expression = ",".join(or_clauses)
-
-        response = (
-            supabase
-            .table("kb_articles")
-            .select("id, title, content, category")
-            .or_(or_expression)
-            .limit(top_k)
-            .execute()
-        )
+        try:
+            rows = _fts_search_articles(q, top_k)
+        except Exception:
+            # kb_fts_search RPC not installed yet (see database/kb_search_optimizations.sql)
+            rows = _ilike_search_articles(q, top_k)
 
-        fallback_results: List[KBSearchResult] = []
-        for row in response.data or []:
-            fallback_results.append(
-                KBSearchResult(
-                    chunk_id=str(row.get("id")),
-                    # We don't have a real similarity score here, so return a neutral 0.5
-                    score=0.5,
-                    content=row.get("content", ""),
-                    article_title=row.get("title"),
-                    article_category=row.get("category"),
-                )
+        return [
+            KBSearchResult(
+                chunk_id=str(row.get("id")),
+                score=float(row.get("score") or 0.0),
+                content=row.get("content", ""),
+                article_title=row.get("title"),
+                article_category=row.get("category"),
             )
-
-        return fallback_results
+            for row in rows
+        ]
 
     except Exception as e:
         raise HTTPException(500, f"Error searching KB: {str(e)}")
@@ -256,24 +348,24 @@ async def search_knowledge_base(
 
 @router.get("/stats")
 async def get_kb_stats():
-    """Get knowledge base statistics"""
+    """Get knowledge base statistics (cached for KB_SUMMARY_CACHE_TTL_SECONDS)"""
     if not supabase:
         raise HTTPException(500, "Database not configured")
+
+    cached = _summary_cache.get("stats")
+    if cached is not None:
+        return cached
     
     try:
-        # Total articles
-        articles_res = supabase.table("kb_articles").select("id", count="exact").execute()
-        total_articles = articles_res.count or 0
-        
-        # Total chunks
-        chunks_res = supabase.table("kb_chunks").select("id", count="exact").execute()
-        total_chunks = chunks_res.count or 0
+        total_articles, total_chunks = _kb_counts()
         
-        return {
+        stats = {
             "total_articles": total_articles,
             "total_chunks": total_chunks,
             "embeddings_model": "all-MiniLM-L12-v2",
         }
+        _summary_cache.set("stats", stats)
+        return stats
         
     except Exception as e:
         raise HTTPException(500, f"Error getting KB stats: {str(e)}")
@@ -3,72 +3,275 @@ Knowledge Base Search Helper (Phase 2B.3)
 
 This module:
 - Uses the same embedding model (`all-MiniLM-L12-v2`) as the index builder
-- Fetches all KB embeddings from Supabase (good enough for ~hundreds of chunks)
-- Computes cosine similarity in Python
+- Ranks chunks with pgvector in the database (`match_kb` RPC)
+- Falls back to scoring all embeddings in Python, from an in-memory copy
+  that is refreshed only when the KB index is rebuilt
 - Returns the top matching chunks with basic article info
 
 Used by the "answer ticket" endpoint to retrieve relevant context.
 """
 
+import io
 import os
-import json
-from typing import List, Dict, Any
+import tempfile
+import threading
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
 
 # IMPORTANT: force Transformers/SentenceTransformers to use only PyTorch
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 os.environ["USE_TF"] = "0"
 
+import numpy as np
+import orjson
 import torch
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from supabase import create_client, Client
+from supabase import Client
+
+from utils.logger import get_logger
+from utils.micro_batcher import MicroBatcher
+from utils.postgrest import is_missing_function
+from utils.torch_threads import configure_inference_threads
+from .db import get_supabase
+
+# Optional: SIMD (AVX2/AVX-512/NEON) cosine kernels for the Python fallback
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+logger = get_logger("kb_search")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase credentials not found in environment")
+# One small intra-op pool shared with roberta_classifier (see utils.torch_threads)
+configure_inference_threads()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = get_supabase()
+
+if supabase is None:
+    raise RuntimeError("Supabase credentials not found in environment")
 
 # Same embedding model as in build_kb_index
 EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L12-v2"
 _model: SentenceTransformer | None = None
 
+# Embedding size of all-MiniLM-L12-v2
+EMBED_DIM = 384
+
+# Question embedding micro-batching (see _batcher)
+EMBED_BATCH_WINDOW_SECONDS = 0.01
+EMBED_MAX_BATCH = 32
+
+# Candidates rescored per requested result after the binary shortlist
+BQ_RESCORE_FACTOR = 4
+
+# Local copy of the fallback's embedding index, reused across restarts
+EMBEDDING_CACHE_PATH = os.getenv(
+    "KB_EMBEDDING_CACHE_PATH", os.path.join(tempfile.gettempdir(), "kb_embeddings.npz")
+)
+_embedding_index: Dict[str, Any] | None = None
+
+# Supabase Storage object holding the same index, published by build_kb_index
+KB_INDEX_BUCKET = os.getenv("KB_INDEX_BUCKET", "kb-index")
+KB_INDEX_OBJECT = "kb_embeddings.npz"
+_embedding_index_lock = threading.Lock()
+
+# int8 quantization: each vector's largest component maps to +/-127
+# (shared with build_kb_index)
+INT8_SCALE = 127
+
+
+# int8-quantized ONNX export shipped in the model repo (uses VNNI on x86)
+ONNX_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
 
 def get_model() -> SentenceTransformer:
-    """Load the embedding model once (CPU-only is fine)."""
+    """Load the sentence-transformer model once (CPU or GPU).
+
+    - GPU: PyTorch weights cast to fp16
+    - CPU: int8 ONNX Runtime export when `sentence-transformers[onnx]` is
+      installed (2-3x faster encoding, 4x smaller), otherwise fp32 PyTorch
+
+    build_kb_index uses this same loader, so chunk and question embeddings
+    always come from the same backend.
+    """
     global _model
     if _model is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        _model = SentenceTransformer(EMBED_MODEL_NAME, device=device)
+        # Use GPU only if PyTorch reports that CUDA is actually available
+        if torch.cuda.is_available():
+            _model = SentenceTransformer(EMBED_MODEL_NAME, device="cuda")
+            _model.half()
+        else:
+            try:
+                _model = SentenceTransformer(
+                    EMBED_MODEL_NAME,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs={"file_name": ONNX_MODEL_FILE},
+                )
+            except Exception:
+                # Older sentence-transformers (no `backend` argument) or
+                # onnxruntime/optimum not installed
+                _model = SentenceTransformer(EMBED_MODEL_NAME, device="cpu")
     return _model
 
 
-def _cosine_similarity(a: torch.Tensor, b: torch.Tensor) -> float:
-    """Compute cosine similarity between two 1D tensors."""
-    a_norm = a / (a.norm() + 1e-8)
-    b_norm = b / (b.norm() + 1e-8)
-    return float((a_norm * b_norm).sum().item())
+def encode_questions(texts: List[str]) -> np.ndarray:
+    """Embed short texts with the model's transformer directly (N x 384).
 
-
-def embed_question(text: str) -> torch.Tensor:
-    """Embed the user question (or ticket text) as a single vector."""
+    Same result as `model.encode(texts, normalize_embeddings=True)` for this
+    model (mean pooling + L2 norm), but skips the encode() wrapper's
+    per-call sorting, batching loop and feature dict plumbing, which is
+    most of the time for a handful of short questions. Works for both the
+    PyTorch and the ONNX backend, which expose the same `auto_model` call.
+    """
     model = get_model()
-    vec = model.encode([text], convert_to_tensor=True)[0]
+    try:
+        transformer = model[0]
+        inputs = model.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=model.max_seq_length,
+            return_tensors="pt",
+        ).to(model.device)
+
+        with torch.inference_mode():
+            hidden = transformer.auto_model(**inputs).last_hidden_state
+
+        # Mean pooling over real (non-padding) tokens, then L2 normalize
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled.float(), p=2, dim=1)
+        return pooled.cpu().numpy()
+    except Exception:
+        # Unexpected module layout: use the regular wrapper
+        return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def _encode_question_batch(texts: List[str]) -> List[np.ndarray]:
+    """Encode a micro-batch of questions; identical questions are encoded once."""
+    unique = list(dict.fromkeys(texts))
+    by_text = dict(zip(unique, encode_questions(unique)))
+    return [by_text[text] for text in texts]
+
+
+# Micro-batches concurrent question embeddings: requests arriving within
+# EMBED_BATCH_WINDOW_SECONDS of each other are encoded with one model call
+# instead of one single-item batch each. Callers block on a Future, so this
+# works from the sync endpoints FastAPI runs in its threadpool.
+_batcher = MicroBatcher(
+    _encode_question_batch,
+    EMBED_BATCH_WINDOW_SECONDS,
+    EMBED_MAX_BATCH,
+    name="kb-embed-batcher",
+)
+
+
+@lru_cache(maxsize=4096)
+def _embed_normalized_question(text: str) -> np.ndarray:
+    vec = _batcher(text)
+    vec = vec.astype(np.float32, copy=True)
+    # Shared by every caller through the cache
+    vec.setflags(write=False)
     return vec
 
 
+def embed_question(text: str) -> np.ndarray:
+    """Embed the user question (or ticket text) as a single unit-length vector.
+
+    Stored chunk embeddings are unit length too, so a plain inner product
+    (pgvector `<#>`, int8 dot products) gives the cosine similarity.
+
+    Popular questions ("password reset", "refund") repeat a lot, so vectors
+    are cached by the lowercased, whitespace-collapsed text. MiniLM's
+    tokenizer is uncased, so this normalization does not change the vector.
+    The vector is returned as a read-only float32 NumPy array: it is copied
+    off the device once here, instead of every consumer (RPC payload,
+    int8 scoring) converting a torch tensor and syncing with the device.
+    """
+    return _embed_normalized_question(" ".join(text.lower().split()))
+
+
+def decode_bytea(raw: str) -> np.ndarray:
+    """Turn a bytea hex string (`\\x...`) back into its raw bytes (uint8)."""
+    return np.frombuffer(bytes.fromhex(raw[2:]), dtype=np.uint8)
+
+
+def quantize_vector(vec: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Quantize one float vector to int8 the same way build_kb_index does.
+
+    Returns (codes, scale) where vec ~= codes * scale.
+    """
+    scale = float(np.abs(vec).max()) / INT8_SCALE or 1.0
+    codes = np.clip(np.round(vec / scale), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+    return codes, scale
+
+
+def parse_float_embedding(raw_emb: Any) -> np.ndarray:
+    """Parse a float `embedding` value into a float32 vector.
+
+    Supabase may return the embedding in different formats
+    - as a Python list of floats
+    - as a list of strings
+    - as a JSON string like "[0.1, 0.2, ...]" (pgvector's text form)
+
+    orjson decodes the JSON and NumPy converts the list in one C loop,
+    instead of json.loads plus a float() call per component.
+    """
+    if isinstance(raw_emb, (str, bytes, bytearray, memoryview)):
+        raw_emb = orjson.loads(raw_emb)
+    return np.asarray(raw_emb, dtype=np.float32)
+
+
 def fetch_all_embeddings() -> List[Dict[str, Any]]:
-    """Fetch all kb_embeddings rows.
+    """Fetch all kb_embeddings rows for the Python fallback.
 
-    For our small KB (tens/hundreds of chunks), it is OK to load all
-    embeddings into memory and compute similarity in Python.
+    Rows are downloaded with their compact int8 columns only. The float
+    `embedding` (~8KB of JSON text per row) is fetched just for older rows
+    that were indexed before `embedding_int8` existed.
     """
-    res = supabase.table("kb_embeddings").select("id, chunk_id, embedding, model").execute()
-    return res.data or []
+    res = supabase.table("kb_embeddings").select(
+        "id, chunk_id, embedding_int8, embedding_scale, embedding_bits, model"
+    ).execute()
+    rows = res.data or []
+
+    missing = [row["id"] for row in rows if not row.get("embedding_int8")]
+    floats: Dict[str, Any] = {}
+    # Batches keep the `id=in.(...)` filter well under URL length limits
+    for start in range(0, len(missing), 100):
+        float_res = (
+            supabase.table("kb_embeddings")
+            .select("id, embedding")
+            .in_("id", missing[start:start + 100])
+            .execute()
+        )
+        floats.update({row["id"]: row.get("embedding") for row in float_res.data or []})
+
+    for row in rows:
+        if row["id"] in floats:
+            row["embedding"] = floats[row["id"]]
+
+    return rows
+
+
+def fetch_index_version() -> str:
+    """Cheap fingerprint of kb_embeddings: the newest created_at.
+
+    One row read through idx_kb_embeddings_created (no count, which would
+    scan the table). build_kb_index clears and rewrites every row, so any
+    rebuild changes it.
+    """
+    res = (
+        supabase.table("kb_embeddings")
+        .select("created_at")
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return res.data[0]["created_at"] if res.data else ""
 
 
 def fetch_chunks_by_ids(chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
@@ -91,6 +294,281 @@ def fetch_articles_by_ids(article_ids: List[str]) -> Dict[str, Dict[str, Any]]:
     return {row["id"]: row for row in rows}
 
 
+def hybrid_search_kb(question: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """Vector + full-text search fused in the database with one RPC call.
+
+    Returns the same dicts as search_kb. Raises if the `kb_hybrid_search`
+    function is not installed, so callers can fall back to search_kb.
+    """
+    if not question.strip():
+        return []
+
+    q_vec = embed_question(question)
+    res = supabase.rpc(
+        "kb_hybrid_search",
+        {"q": question, "q_embedding": q_vec.tolist(), "k": top_k},
+    ).execute()
+
+    return [
+        {
+            "chunk_id": row["chunk_id"],
+            "score": float(row.get("score") or 0.0),
+            "content": row.get("content") or "",
+            "article_title": row.get("article_title"),
+            "article_category": row.get("article_category"),
+        }
+        for row in res.data or []
+    ]
+
+
+def match_kb_rows(q_vec: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    """Top-k chunks with article info from one `match_kb` RPC call.
+
+    pgvector ranks the chunks and the same query joins kb_chunks and
+    kb_articles, replacing the embeddings -> chunks -> articles round trips.
+    Raises if the function is not installed.
+    """
+    res = supabase.rpc(
+        "match_kb",
+        {"query_embedding": q_vec.tolist(), "k": top_k},
+    ).execute()
+    return [
+        {
+            "chunk_id": row["chunk_id"],
+            "score": float(row.get("score") or 0.0),
+            "content": row.get("content") or "",
+            "article_title": row.get("article_title"),
+            "article_category": row.get("article_category"),
+        }
+        for row in res.data or []
+    ]
+
+
+def int8_scores(
+    codes: np.ndarray,
+    scales: np.ndarray,
+    q_codes: np.ndarray,
+    q_scale: float,
+) -> np.ndarray:
+    """Similarity of an int8 query against every row of an int8 matrix.
+
+    - SimSIMD (when installed): int8 cosine kernel (VNNI / NEON sdot); the
+      per-vector scales cancel out in a cosine, so they are not needed
+    - NumPy: int32 dot products de-scaled by `q_scale * scales`, which is
+      the cosine because stored vectors and the query are unit length
+    """
+    if simsimd is not None:
+        distances = simsimd.cdist(q_codes.reshape(1, -1), codes, metric="cosine")
+        return 1.0 - np.asarray(distances, dtype=np.float32)[0]
+
+    dots = codes.astype(np.int32) @ q_codes.astype(np.int32)
+    return dots.astype(np.float32) * (scales * np.float32(q_scale))
+
+
+def hamming_distances(bits: np.ndarray, q_bits: np.ndarray) -> np.ndarray:
+    """Hamming distance of packed query bits against every row of `bits`."""
+    if simsimd is not None:
+        try:
+            distances = simsimd.cdist(q_bits.reshape(1, -1), bits, metric="hamming", dtype="bin8")
+            return np.asarray(distances, dtype=np.float32)[0]
+        except (TypeError, ValueError):
+            # Older simsimd without packed-bit support
+            pass
+
+    return np.unpackbits(np.bitwise_xor(bits, q_bits), axis=1).sum(axis=1)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the `top_k` highest scores, best first.
+
+    np.argpartition selects them in O(N); only those k are then sorted.
+    Shared boilerplate chunks have identical embeddings, so the final sort
+    is stable to keep tied results in a deterministic (index) order.
+    """
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    neg = -scores
+    if k == len(scores):
+        return np.argsort(neg, kind="stable")
+
+    idx = np.argpartition(neg, k - 1)[:k]
+    idx.sort()
+    return idx[np.argsort(neg[idx], kind="stable")]
+
+
+def build_embedding_index(rows: List[Dict[str, Any]], version: str) -> Dict[str, Any]:
+    """Stack kb_embeddings rows into the arrays scan_chunk_scores works on.
+
+    Every vector is kept as int8 (older float-only rows are quantized on
+    load) along with its scale and its 48-byte sign code.
+    """
+    chunk_ids: List[str] = []
+    codes: List[np.ndarray] = []
+    scales: List[float] = []
+    bits: List[np.ndarray] = []
+    for row in rows:
+        try:
+            raw_int8 = row.get("embedding_int8")
+            if raw_int8:
+                vec_codes = decode_bytea(raw_int8).view(np.int8)
+                # Rows indexed before per-vector scales used 1/127
+                scale = float(row.get("embedding_scale") or 1.0 / INT8_SCALE)
+            elif row.get("embedding") is not None:
+                vec = parse_float_embedding(row["embedding"])
+                vec_codes, scale = quantize_vector(vec / (np.linalg.norm(vec) + 1e-8))
+            else:
+                continue
+
+            raw_bits = row.get("embedding_bits")
+            vec_bits = decode_bytea(raw_bits) if raw_bits else np.packbits(vec_codes > 0)
+        except (ValueError, TypeError):
+            # Skip malformed embeddings instead of crashing
+            continue
+
+        if vec_codes.shape != (EMBED_DIM,) or vec_bits.shape != (EMBED_DIM // 8,):
+            continue
+        chunk_ids.append(row["chunk_id"])
+        codes.append(vec_codes)
+        scales.append(scale)
+        bits.append(vec_bits)
+
+    return {
+        "version": version,
+        "chunk_ids": np.asarray(chunk_ids, dtype=str),
+        "codes": np.stack(codes) if codes else np.empty((0, EMBED_DIM), dtype=np.int8),
+        "scales": np.asarray(scales, dtype=np.float32),
+        "bits": np.stack(bits) if bits else np.empty((0, EMBED_DIM // 8), dtype=np.uint8),
+    }
+
+
+def _index_to_bytes(index: Dict[str, Any]) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, **index)
+    return buf.getvalue()
+
+
+def _index_from_bytes(data: bytes, version: str) -> Dict[str, Any] | None:
+    """Decode a saved index, or None if it was built for another version."""
+    with np.load(io.BytesIO(data)) as saved:
+        if str(saved["version"]) != version:
+            return None
+        return {key: saved[key] for key in saved.files} | {"version": version}
+
+
+def _load_index_file(version: str) -> Dict[str, Any] | None:
+    """Load the on-disk copy of the index if it matches `version`."""
+    try:
+        with open(EMBEDDING_CACHE_PATH, "rb") as f:
+            return _index_from_bytes(f.read(), version)
+    except Exception:
+        return None
+
+
+def _save_index_file(index: Dict[str, Any]) -> None:
+    """Save the index so a restarted worker can skip the full download."""
+    tmp_path = f"{EMBEDDING_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_index_to_bytes(index))
+        # Atomic swap, so other workers never read a half-written file
+        os.replace(tmp_path, EMBEDDING_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"Could not write embedding cache: {e}")
+
+
+def _download_index(version: str) -> Dict[str, Any] | None:
+    """Fetch the index published by build_kb_index from Supabase Storage.
+
+    One object download instead of paging through every kb_embeddings row.
+    """
+    try:
+        data = supabase.storage.from_(KB_INDEX_BUCKET).download(KB_INDEX_OBJECT)
+        return _index_from_bytes(data, version)
+    except Exception:
+        return None
+
+
+def publish_embedding_index() -> int:
+    """Build the fallback index from kb_embeddings and upload it to Storage.
+
+    Called by build_kb_index after a rebuild. The arrays are stored
+    contiguously in one .npz object. Returns the number of vectors.
+    """
+    index = build_embedding_index(fetch_all_embeddings(), fetch_index_version())
+    supabase.storage.from_(KB_INDEX_BUCKET).upload(
+        KB_INDEX_OBJECT,
+        _index_to_bytes(index),
+        {"content-type": "application/octet-stream", "upsert": "true"},
+    )
+    return len(index["chunk_ids"])
+
+
+def get_embedding_index() -> Dict[str, Any]:
+    """Return the in-memory embedding index, rebuilding it if the KB changed.
+
+    A cheap version query runs on every call. When the KB was rebuilt the
+    index is loaded from, in order: the local cache file, the object
+    published to Supabase Storage, or (last resort) every kb_embeddings row.
+    The lock makes concurrent requests wait for one load instead of each
+    starting their own.
+    """
+    global _embedding_index
+
+    version = fetch_index_version()
+    index = _embedding_index
+    if index is not None and index["version"] == version:
+        return index
+
+    with _embedding_index_lock:
+        index = _embedding_index
+        if index is not None and index["version"] == version:
+            return index
+
+        index = _load_index_file(version)
+        if index is None:
+            index = _download_index(version)
+            if index is None:
+                index = build_embedding_index(fetch_all_embeddings(), version)
+            _save_index_file(index)
+
+        _embedding_index = index
+        return index
+
+
+def scan_chunk_scores(q_vec: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    """Top-k chunk ids + cosine scores computed in Python.
+
+    Fallback for databases without `match_kb`, over the cached embedding
+    index (see get_embedding_index):
+    - Shortlist `top_k * 4` candidates by Hamming distance on the 48-byte
+      sign codes
+    - Rescore the shortlist with int8 cosine (see int8_scores)
+    """
+    index = get_embedding_index()
+    chunk_ids = index["chunk_ids"]
+    if len(chunk_ids) == 0:
+        return []
+
+    # Already unit length (see embed_question)
+    q = q_vec
+
+    candidates = np.arange(len(chunk_ids))
+    n_candidates = top_k * BQ_RESCORE_FACTOR
+    if len(candidates) > n_candidates:
+        distances = hamming_distances(index["bits"], np.packbits(q > 0))
+        candidates = top_k_indices(-distances.astype(np.float32), n_candidates)
+
+    q_codes, q_scale = quantize_vector(q)
+    scores = int8_scores(index["codes"][candidates], index["scales"][candidates], q_codes, q_scale)
+
+    return [
+        {"chunk_id": str(chunk_ids[candidates[i]]), "score": float(scores[i])}
+        for i in top_k_indices(scores, top_k)
+    ]
+
+
 def search_kb(question: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """Search the KB for the most relevant chunks.
 
@@ -106,41 +584,18 @@ def search_kb(question: str, top_k: int = 5) -> List[Dict[str, Any]]:
 
     q_vec = embed_question(question)
 
-    all_embs = fetch_all_embeddings()
-    if not all_embs:
-        return []
+    try:
+        return match_kb_rows(q_vec, top_k)
+    except Exception as e:
+        # Score in Python only when match_kb is not installed yet; other
+        # errors (timeouts, auth) go to the caller
+        if not is_missing_function(e):
+            raise
 
-    # Compute cosine similarity between question and every chunk embedding
-    scored: List[Dict[str, Any]] = []
-    for row in all_embs:
-        raw_emb = row.get("embedding")
-        if raw_emb is None:
-            continue
-
-        # Supabase may return the embedding in different formats
-        # - as a Python list of floats
-        # - as a list of strings
-        # - as a JSON string like "[0.1, 0.2, ...]"
-        try:
-            if isinstance(raw_emb, str):
-                # Try to parse JSON string
-                emb_list = json.loads(raw_emb)
-            else:
-                emb_list = raw_emb
-
-            # Ensure we have a list of floats
-            emb_list = [float(x) for x in emb_list]
-        except Exception:
-            # Skip malformed embeddings instead of crashing
-            continue
+    top = scan_chunk_scores(q_vec, top_k)
 
-        emb_tensor = torch.tensor(emb_list, dtype=torch.float32)
-        score = _cosine_similarity(q_vec, emb_tensor)
-        scored.append({"chunk_id": row["chunk_id"], "score": score})
-
-    # Sort by score descending and keep top_k
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    top = scored[:top_k]
+    if not top:
+        return []
 
     chunk_ids = [x["chunk_id"] for x in top]
     chunks = fetch_chunks_by_ids(chunk_ids)
@@ -164,3 +619,15 @@ def search_kb(question: str, top_k: int = 5) -> List[Dict[str, Any]]:
         )
 
     return results
+
+
+def warm_up() -> None:
+    """Load the embedding model and run one encode so the first real
+    request does not pay model loading or workspace allocation."""
+    encode_questions(["warmup"])
+
+
+# Long-lived API processes: load models at startup instead of on the
+# first request (set PRELOAD_MODELS=1)
+if os.getenv("PRELOAD_MODELS") == "1":
+    warm_up()
@@ -3,7 +3,9 @@ Simple helper to use the trained RoBERTa model for ticket classification.
 
 This module:
 - Loads the fine-tuned model from models/roberta_ticket_category
+  (on CPU, the int8 ONNX export from export_roberta_onnx when present)
 - Provides classify_ticket(text) -> category string
+- Micro-batches concurrent classifications into one forward pass
 
 It is used by ticket_api.create_ticket to auto-set ticket.category.
 """
@@ -15,15 +17,44 @@ from typing import List
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 os.environ["USE_TF"] = "0"
 
+import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from utils.logger import get_logger
+from utils.micro_batcher import MicroBatcher
+from utils.torch_threads import configure_inference_threads
+
+# Optional: ONNX Runtime for the int8 CPU model
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = get_logger("roberta_classifier")
+
 # Model directory (relative to clara-backend root)
 MODEL_DIR = os.path.join("models", "roberta_ticket_category")
 
+# Same sequence cap as train_roberta_classifier
+MAX_LENGTH = 128
+
+# int8 ONNX export written by export_roberta_onnx
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, "onnx", "model_int8.onnx")
+
+# Concurrent classifications arriving within this window share one forward
+# pass (padded to the longest text in the batch)
+CLASSIFY_BATCH_WINDOW_SECONDS = 0.01
+CLASSIFY_MAX_BATCH = 16
+
+# Used when the model cannot be loaded
+FALLBACK_RESULT = {"category": "general", "confidence": 0.5}
+
 # Global variables for lazy loading
 _tokenizer = None
 _model = None
+_session = None  # onnxruntime.InferenceSession when the ONNX model is used
+_autocast_dtype = None  # reduced precision for the PyTorch forward, if supported
 _label_classes: List[str] = []
 
 
@@ -38,14 +69,56 @@ def _load_label_classes(path: str) -> List[str]:
     return classes
 
 
+def _pick_autocast_dtype(device: torch.device):
+    """Reduced-precision dtype for the forward pass, or None to stay FP32.
+
+    - GPU: BF16 where supported (Ampere+), otherwise FP16
+    - CPU: BF16 only on CPUs with native BF16 instructions (AVX512-BF16 /
+      AMX, e.g. Sapphire Rapids, Zen 4); elsewhere BF16 is emulated and
+      slower than FP32
+    """
+    if device.type == "cuda":
+        return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+    has_bf16 = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    if has_bf16 is not None and has_bf16():
+        return torch.bfloat16
+    return None
+
+
+def _onnx_model_is_current() -> bool:
+    """True if the int8 ONNX export was built from the current weights.
+
+    The export is a copy: after retraining into MODEL_DIR it keeps the old
+    weights (and the old class order), so it is only used when it is newer
+    than every weight file and label_classes.txt.
+    """
+    if not os.path.isfile(ONNX_MODEL_PATH):
+        return False
+
+    sources = [
+        os.path.join(MODEL_DIR, name)
+        for name in ("model.safetensors", "pytorch_model.bin", "config.json", "label_classes.txt")
+    ]
+    newest_source = max((os.path.getmtime(path) for path in sources if os.path.isfile(path)), default=0.0)
+    if os.path.getmtime(ONNX_MODEL_PATH) >= newest_source:
+        return True
+
+    logger.warning(
+        f"{ONNX_MODEL_PATH} is older than the model in {MODEL_DIR}; serving the PyTorch model. "
+        "Re-run export_roberta_onnx to rebuild it."
+    )
+    return False
+
+
 def load_model_if_needed() -> None:
     """Load tokenizer, model, and labels once into memory.
 
     Called automatically by classify_ticket().
     """
-    global _tokenizer, _model, _label_classes
+    global _tokenizer, _model, _session, _autocast_dtype, _label_classes
 
-    if _tokenizer is not None and _model is not None and _label_classes:
+    if _tokenizer is not None and (_model is not None or _session is not None) and _label_classes:
         return
 
     if not os.path.isdir(MODEL_DIR):
@@ -53,12 +126,35 @@ def load_model_if_needed() -> None:
 
     # Load tokenizer and model
     _tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-    _model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-    _model.eval()
 
-    # Use GPU if available, otherwise CPU
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    _model.to(device)
+    # On CPU prefer the int8 ONNX model (2-4x faster than FP32 PyTorch)
+    if not torch.cuda.is_available() and ort is not None and _onnx_model_is_current():
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = configure_inference_threads()
+        options.inter_op_num_threads = 1
+        _session = ort.InferenceSession(
+            ONNX_MODEL_PATH,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+    else:
+        _model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
+        _model.eval()
+
+        # Use GPU if available, otherwise CPU
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        _model.to(device)
+
+        if device.type == "cpu":
+            # Share the process-wide inference thread pool (no oversubscription)
+            configure_inference_threads()
+
+        _autocast_dtype = _pick_autocast_dtype(device)
+
+        # Optional: fuse kernels with torch.compile. Off by default because
+        # the first request pays the compile time (tens of seconds).
+        if os.getenv("ROBERTA_TORCH_COMPILE") == "1" and hasattr(torch, "compile"):
+            _model = torch.compile(_model, mode="reduce-overhead", dynamic=True)
 
     # Load label classes (index -> category string)
     classes_path = os.path.join(MODEL_DIR, "label_classes.txt")
@@ -81,42 +177,115 @@ def classify_ticket_with_confidence(text: str) -> dict:
     Returns a dict with:
     - category: string like "technical", "billing", etc.
     - confidence: float between 0 and 1
+
+    Calls from concurrent requests are batched (see _batcher).
     """
+    return _batcher(text)
+
+
+def classify_tickets_with_confidence(texts: List[str]) -> List[dict]:
+    """Batched classify_ticket_with_confidence: one forward pass for all texts."""
+    if not texts:
+        return []
+
     try:
         load_model_if_needed()
     except Exception:
         # If model is not available for any reason, fall back gracefully
-        return {"category": "general", "confidence": 0.5}
+        return [dict(FALLBACK_RESULT) for _ in texts]
+
+    assert _tokenizer is not None and _label_classes
 
-    assert _tokenizer is not None and _model is not None and _label_classes
+    if _session is not None:
+        probabilities = _predict_onnx(texts)
+    else:
+        probabilities = _predict_torch(texts)
+
+    results = []
+    for row in probabilities:
+        predicted_idx = int(row.argmax())
+        if 0 <= predicted_idx < len(_label_classes):
+            results.append({
+                "category": _label_classes[predicted_idx],
+                "confidence": float(row[predicted_idx]),
+            })
+        else:
+            results.append(dict(FALLBACK_RESULT))
+    return results
+
+
+def _predict_onnx(texts: List[str]) -> np.ndarray:
+    """Class probabilities (N x classes) from the int8 ONNX model."""
+    inputs = _tokenizer(
+        texts,
+        padding=True,
+        truncation=True,
+        max_length=MAX_LENGTH,
+        return_tensors="np",
+    )
+    (logits,) = _session.run(
+        ["logits"],
+        {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64),
+        },
+    )
 
+    # Softmax (shifted for numerical stability)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _predict_torch(texts: List[str]) -> np.ndarray:
+    """Class probabilities (N x classes) from the PyTorch model."""
     device = next(_model.parameters()).device
 
-    # Tokenize input text
+    # Tokenize input texts. Pad only to the longest text in the batch (a
+    # single ticket gets no padding): encoding real lengths (usually ~20-40
+    # tokens) instead of 128 keeps attention cost at L^2 rather than 128^2.
+    # 128 stays the upper bound.
     inputs = _tokenizer(
-        text,
+        texts,
+        padding=True,
         truncation=True,
-        padding="max_length",
-        max_length=128,
+        max_length=MAX_LENGTH,
         return_tensors="pt",
     ).to(device)
 
-    with torch.no_grad():
+    # inference_mode is cheaper than no_grad (no view/version tracking)
+    with torch.inference_mode(), torch.autocast(
+        device_type=device.type,
+        dtype=_autocast_dtype or torch.float32,
+        enabled=_autocast_dtype is not None,
+    ):
         outputs = _model(**inputs)
         logits = outputs.logits
-        
+
         # Apply softmax to get probabilities
         probabilities = torch.nn.functional.softmax(logits, dim=-1)
-        
-        # Get the predicted class and its confidence
-        confidence, predicted_idx = torch.max(probabilities, dim=-1)
-        predicted_idx = int(predicted_idx.item())
-        confidence_score = float(confidence.item())
-
-    if 0 <= predicted_idx < len(_label_classes):
-        return {
-            "category": _label_classes[predicted_idx],
-            "confidence": confidence_score
-        }
-
-    return {"category": "general", "confidence": 0.5}
+
+    return probabilities.float().cpu().numpy()
+
+
+# Micro-batches concurrent ticket classifications: requests arriving within
+# CLASSIFY_BATCH_WINDOW_SECONDS of each other are classified with one forward
+# pass instead of one pass each. Callers block on a Future, so this works from
+# the worker threads ticket_api runs the classifier in.
+_batcher = MicroBatcher(
+    classify_tickets_with_confidence,
+    CLASSIFY_BATCH_WINDOW_SECONDS,
+    CLASSIFY_MAX_BATCH,
+    name="roberta-batcher",
+)
+
+
+def warm_up() -> None:
+    """Load the classifier and run one prediction so the first real ticket
+    does not pay model loading or workspace allocation."""
+    classify_ticket_with_confidence("warmup")
+
+
+# Long-lived API processes: load models at startup instead of on the
+# first request (set PRELOAD_MODELS=1)
+if os.getenv("PRELOAD_MODELS") == "1":
+    warm_up()
@@ -11,43 +11,42 @@ Run from clara-backend folder:
 You can run it multiple times; it will not create duplicate titles.
 """
 
-import os
+from dataclasses import asdict, dataclass, field
 from typing import List, Dict
 
-from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import Client
 
-load_dotenv()
+from .db import get_supabase
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+supabase: Client = get_supabase()
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+if supabase is None:
     raise RuntimeError("Supabase credentials not found in environment")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+@dataclass(slots=True)
+class Faq:
+    """One FAQ article; field names match the kb_articles columns."""
 
-def build_faq_articles() -> List[Dict]:
+    title: str
+    category: str
+    summary: str
+    content: str
+    tags: List[str] = field(default_factory=list)
+    state: str = "published"
+
+
+def build_faq_articles() -> List[Faq]:
     """Return a list of FAQ articles (title, content, summary, category, tags).
 
     These are generic customer-support style FAQs. You can later
     edit or delete them directly from Supabase if needed.
     """
 
-    faqs: List[Dict] = []
+    faqs: List[Faq] = []
 
     def add(title: str, category: str, summary: str, body: str, tags=None):
-        faqs.append(
-            {
-                "title": title,
-                "category": category,
-                "summary": summary,
-                "content": body,
-                "tags": tags or [category],
-                "state": "published",
-            }
-        )
+        faqs.append(Faq(title, category, summary, body, tags or [category]))
 
     # Account / Login
     add(
@@ -206,28 +205,38 @@ def build_faq_articles() -> List[Dict]:
     return faqs
 
 
+def _insert_missing(payloads: List[Dict]) -> int:
+    """Fallback when kb_articles has no unique title index.
+
+    One SELECT for the titles that already exist, then one bulk INSERT.
+    """
+    titles = [p["title"] for p in payloads]
+    existing = supabase.table("kb_articles").select("title").in_("title", titles).execute()
+    existing_titles = {row["title"] for row in existing.data or []}
+
+    new_rows = [p for p in payloads if p["title"] not in existing_titles]
+    if not new_rows:
+        return 0
+
+    res = supabase.table("kb_articles").insert(new_rows).execute()
+    return len(res.data or [])
+
+
 def main() -> None:
-    articles = build_faq_articles()
-
-    inserted = 0
-    for art in articles:
-        # Avoid duplicates by title
-        existing = supabase.table("kb_articles").select("id").eq("title", art["title"]).execute()
-        if existing.data:
-            continue
-
-        payload = {
-            "title": art["title"],
-            "content": art["content"],
-            "summary": art["summary"],
-            "category": art["category"],
-            "tags": art["tags"],
-            "state": art.get("state", "published"),
-        }
-
-        res = supabase.table("kb_articles").insert(payload).execute()
-        if res.data:
-            inserted += 1
+    # Serialize to plain dicts only for the request body
+    payloads = [asdict(faq) for faq in build_faq_articles()]
+
+    # One bulk upsert; existing titles are left untouched.
+    # Needs the unique title index from database/kb_search_optimizations.sql.
+    try:
+        res = (
+            supabase.table("kb_articles")
+            .upsert(payloads, on_conflict="title", ignore_duplicates=True)
+            .execute()
+        )
+        inserted = len(res.data or [])
+    except Exception:
+        inserted = _insert_missing(payloads)
 
     print(f"Inserted {inserted} new kb_articles (others already existed).")
 
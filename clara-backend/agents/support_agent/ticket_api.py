@@ -2,38 +2,126 @@
 Ticket API - Support Agent Core
 Husnain's Implementation with Supabase
 """
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, TypeAdapter
 from typing import Optional, List
-from datetime import datetime
-from uuid import uuid4
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from .roberta_classifier import classify_ticket, classify_ticket_with_confidence
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+from supabase import Client
+from .db import get_supabase
+from .roberta_classifier import CLASSIFY_MAX_BATCH, classify_ticket, classify_ticket_with_confidence
 from .kb_search import search_kb
-import requests
-from utils.llm_helper import call_llm
+from utils.micro_batcher import MicroBatcher
+from utils.ttl_cache import TTLCache
+from utils.llm_helper import call_llm_async, close_async_client, stream_llm_async
+from utils.logger import get_logger
 
-load_dotenv()
+# Optional: Redis for ticket messages shared across workers
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
 
-router = APIRouter(prefix="/api/tickets", tags=["Tickets"])
+logger = get_logger("ticket_api")
+
+# orjson renders responses several times faster than FastAPI's default
+# json encoder, which matters most for the ticket lists
+router = APIRouter(prefix="/api/tickets", tags=["Tickets"], default_response_class=ORJSONResponse)
 
 # Supabase client (using SERVICE_ROLE for backend operations)
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
+supabase: Client = get_supabase()
 
-if not supabase_url or not supabase_key:
+if supabase is None:
     print("⚠️  WARNING: Supabase credentials not found in .env")
-    supabase: Client = None
 else:
-    supabase: Client = create_client(supabase_url, supabase_key)
     print("✅ Supabase client initialized (service_role)")
 
 
-# Simple in-memory message store for demo/chat UI
-# Keyed by ticket_id -> list of message dicts
-IN_MEMORY_MESSAGES: dict[str, list[dict]] = {}
+@router.on_event("shutdown")
+async def shutdown_ticket_api():
+    """Release the keep-alive connections used for LLM calls and Redis, and
+    write any queued ticket history."""
+    await close_async_client()
+    await asyncio.to_thread(_history_writer.flush)
+    _classifier_executor.shutdown(wait=False)
+    if _redis is not None:
+        await _redis.aclose()
+
+
+# Ticket chat messages live in Redis when REDIS_URL is set (shared by every
+# worker), one list per ticket at `ticket:{id}:messages`. Without Redis
+# they fall back to this in-memory store (keyed by ticket_id -> list of
+# message dicts), which each worker keeps separately.
+IN_MEMORY_MESSAGES: dict[str, list[dict]] = defaultdict(list)
+
+# Per ticket: keep the latest N messages, drop idle conversations after a day
+MESSAGES_MAX_PER_TICKET = 500
+MESSAGES_TTL_SECONDS = 86400
+
+REDIS_URL = os.getenv("REDIS_URL")
+_redis = aioredis.from_url(REDIS_URL, decode_responses=True) if (aioredis and REDIS_URL) else None
+
+# Threads that wait on the (micro-batched) classifier. Kept apart from the
+# default pool used by run_query, so a burst of new tickets cannot take
+# every thread the database calls need. One per batch slot lets a full
+# batch form.
+_classifier_executor = ThreadPoolExecutor(max_workers=CLASSIFY_MAX_BATCH, thread_name_prefix="ticket-classify")
+
+# Ticket priority derived from the predicted category
+CATEGORY_PRIORITY: dict[str, str] = {
+    "technical": "high",
+    "billing": "high",
+    "account": "normal",
+    "product": "low",
+}
+DEFAULT_PRIORITY = "normal"
+
+# Columns TicketResponse is built from (instead of select("*"), which also
+# ships resolved_at, closed_at, etc. for every row)
+TICKET_COLUMNS = (
+    "id, customer_id, subject, description, channel, category, priority, status, "
+    "resolution, needs_human_review, created_at, updated_at, confidence, "
+    "customers(email, name)"
+)
+
+# Customer rows by email. Repeat senders (especially email ingestion) skip
+# the SELECT round trip. Nothing in this API edits customers, so entries
+# just expire.
+CUSTOMER_CACHE_TTL_SECONDS = 300
+_customer_cache = TTLCache(maxsize=10_000, ttl=CUSTOMER_CACHE_TTL_SECONDS)
+
+# KB results and LLM answers by question hash. Repeat questions (or the
+# same ticket answered twice) skip embedding + vector search, and also the
+# LLM when the retrieved sources are the same.
+KB_ANSWER_CACHE_TTL_SECONDS = 600
+_kb_results_cache = TTLCache(maxsize=2048, ttl=KB_ANSWER_CACHE_TTL_SECONDS)
+_answer_cache = TTLCache(maxsize=2048, ttl=KB_ANSWER_CACHE_TTL_SECONDS)
+
+# ticket_history rows are written in batches: up to HISTORY_MAX_BATCH rows
+# per insert, at most HISTORY_FLUSH_SECONDS after the first one was queued
+HISTORY_MAX_BATCH = 50
+HISTORY_FLUSH_SECONDS = 0.5
+
+NO_ANSWER_TEXT = "AI answer is not available right now. No response from the model."
+
+# Columns returned by GET /stats (and by the get_ticket_stats() SQL function)
+TICKET_STAT_KEYS = (
+    "total_tickets",
+    "open_tickets",
+    "resolved_tickets",
+    "needs_human_review",
+    "resolved_by_ai",
+)
+
+# Cap on KB source text sent to the LLM (~1500 tokens), to bound prompt size
+MAX_CONTEXT_CHARS = 6000
 
 
 # ─────────────────────────────────────────────────────────────────────────
@@ -140,55 +228,218 @@ class EmailIngestRequest(BaseModel):
 # ─────────────────────────────────────────────────────────────────────────
 
 def get_or_create_customer(email: str):
-    """Find existing customer or create new one"""
+    """Find existing customer or create new one (cached by email)"""
     if not supabase:
         raise HTTPException(500, "Database not configured")
     
+    cached = _customer_cache.get(email)
+    if cached is not None:
+        return cached
+    
     # Check if customer exists
-    response = supabase.table("customers").select("*").eq("email", email).execute()
+    response = supabase.table("customers").select("id, email, name").eq("email", email).execute()
     
     if response.data and len(response.data) > 0:
+        _customer_cache.set(email, response.data[0])
         return response.data[0]
     
     # Create new customer
+    now = utc_now_iso()
     customer_data = {
         "email": email,
         "name": email.split('@')[0],  # Use email prefix as name
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat()
+        "created_at": now,
+        "updated_at": now
     }
     
     response = supabase.table("customers").insert(customer_data).execute()
     
     if response.data and len(response.data) > 0:
+        _customer_cache.set(email, response.data[0])
         return response.data[0]
     
     raise HTTPException(500, "Failed to create customer")
 
 
+async def classify_async(text: str) -> dict:
+    """classify_ticket_with_confidence without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_classifier_executor, classify_ticket_with_confidence, text)
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO 8601 string (timezone-aware; utcnow() is
+    deprecated). Compute it once per request and reuse it."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def run_query(query):
+    """Execute a Supabase query without blocking the event loop.
+
+    The supabase-py client is synchronous: `.execute()` waits for the
+    PostgREST round trip. Running it in a worker thread lets other requests
+    on this worker proceed in the meantime.
+    """
+    return await asyncio.to_thread(query.execute)
+
+
+def _insert_history(rows: List[dict]) -> None:
+    """Insert one batch of ticket_history rows in a single multi-row insert."""
+    try:
+        supabase.table("ticket_history").insert(rows).execute()
+    except Exception as e:
+        logger.warning(f"Could not log {len(rows)} ticket history rows: {e}")
+
+
+# History rows are an audit trail that no response waits for, so callers only
+# queue them. Rows queued within HISTORY_FLUSH_SECONDS of each other go to
+# Supabase in one insert. The batcher is thread-safe, so helpers running in
+# worker threads (save_ai_answer) can queue rows too.
+_history_writer = MicroBatcher(
+    _insert_history,
+    HISTORY_FLUSH_SECONDS,
+    HISTORY_MAX_BATCH,
+    name="ticket-history-writer",
+)
+
+
+def log_history(history_data: dict) -> None:
+    """Queue a ticket_history row; it is inserted with the next batch."""
+    row = dict(history_data)
+    # Every row in one insert must have the same columns. Fill missing ones
+    # with the column default ('{}'), which a single-row insert would apply
+    row.setdefault("old_values", {})
+    row.setdefault("new_values", {})
+    _history_writer.submit(row)
+
+
+def _messages_key(ticket_id: str) -> str:
+    return f"ticket:{ticket_id}:messages"
+
+
+async def load_messages(ticket_id: str) -> List[dict]:
+    """All stored chat messages for a ticket, oldest first."""
+    if _redis is not None:
+        raw = await _redis.lrange(_messages_key(ticket_id), 0, -1)
+        return [json.loads(m) for m in raw]
+    return list(IN_MEMORY_MESSAGES.get(ticket_id, []))
+
+
+async def append_message(ticket_id: str, message: dict) -> None:
+    """Store a chat message, keeping at most MESSAGES_MAX_PER_TICKET per ticket."""
+    if _redis is not None:
+        key = _messages_key(ticket_id)
+        # One round trip for append + trim + expiry
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, json.dumps(message))
+            pipe.ltrim(key, -MESSAGES_MAX_PER_TICKET, -1)
+            pipe.expire(key, MESSAGES_TTL_SECONDS)
+            await pipe.execute()
+        return
+
+    messages = IN_MEMORY_MESSAGES[ticket_id]
+    messages.append(message)
+    if len(messages) > MESSAGES_MAX_PER_TICKET:
+        del messages[:-MESSAGES_MAX_PER_TICKET]
+
+
+def ticket_dict_from_row(
+    t: dict,
+    customer: Optional[dict] = None,
+    confidence: Optional[float] = None,
+) -> dict:
+    """Map a `tickets` row to the TicketResponse fields, as a plain dict.
+
+    `customer` defaults to the row's embedded `customers(email, name)` and
+    `confidence` to the stored value.
+    """
+    if customer is None:
+        customer = t.get("customers") or {}
+    if confidence is None:
+        confidence = t.get("confidence")
+
+    return {
+        "id": str(t["id"]),
+        "customer_id": str(t["customer_id"]) if t.get("customer_id") else None,
+        "customer_email": customer.get("email"),
+        "customer_name": customer.get("name"),
+        "subject": t["subject"],
+        "description": t["description"],
+        "channel": t["channel"],
+        "category": t.get("category"),
+        "priority": t["priority"],
+        "status": t["status"],
+        "resolution": t.get("resolution"),
+        "needs_human_review": t.get("needs_human_review"),
+        "created_at": t["created_at"],
+        "updated_at": t["updated_at"],
+        "confidence": confidence,
+    }
+
+
+def ticket_response_from_row(
+    t: dict,
+    customer: Optional[dict] = None,
+    confidence: Optional[float] = None,
+) -> TicketResponse:
+    """Build a TicketResponse from a `tickets` row.
+
+    Validating one dict with model_validate skips the keyword-argument
+    binding of TicketResponse(...).
+    """
+    return TicketResponse.model_validate(ticket_dict_from_row(t, customer, confidence))
+
+
+# Validate + dump whole lists in one pass. The endpoints below return an
+# ORJSONResponse built from these, so FastAPI does not validate and
+# serialize the same data a second time.
+_ticket_list_adapter = TypeAdapter(List[TicketResponse])
+_message_list_adapter = TypeAdapter(List[TicketMessageResponse])
+
+
+def ticket_list_response(rows: List[dict], headers: Optional[dict] = None) -> ORJSONResponse:
+    """Render ticket rows as a JSON list of TicketResponse for the list endpoints."""
+    tickets = _ticket_list_adapter.validate_python([ticket_dict_from_row(t) for t in rows])
+    return ORJSONResponse(_ticket_list_adapter.dump_python(tickets, mode="json"), headers=headers)
+
+
+def message_dict_from_stored(m: dict, now: str) -> dict:
+    """Map a stored chat message to the TicketMessageResponse fields.
+
+    Older/partial entries get the same defaults the chat UI expects; `now`
+    fills a missing created_at/updated_at.
+    """
+    return {
+        "id": str(m["id"]),
+        "ticket_id": str(m["ticket_id"]),
+        "sender_type": m.get("sender_type") or "customer",
+        "sender_id": m.get("sender_id"),
+        "sender_name": m.get("sender_name") or "User",
+        "sender_avatar": m.get("sender_avatar"),
+        "content": m.get("content") or "",
+        "content_type": m.get("content_type") or "text",
+        "is_ai_generated": bool(m.get("is_ai_generated") or False),
+        "ai_suggested": bool(m.get("ai_suggested") or False),
+        "is_read": bool(m.get("is_read") or True),
+        "read_at": m.get("read_at"),
+        "created_at": m.get("created_at") or now,
+        "updated_at": m.get("updated_at") or now,
+    }
+
+
 def derive_priority_from_category(category: str) -> str:
     """Simple rule-based mapping from category -> priority.
 
     This keeps logic easy to understand while still using the model output.
-    You can adjust these rules later if needed.
+    You can adjust the rules in CATEGORY_PRIORITY later if needed.
     """
 
-    category = (category or "").lower()
-
-    if category in {"technical", "billing"}:
-        return "high"
-    if category in {"account"}:
-        return "normal"
-    if category in {"product"}:
-        return "low"
-
     # Default for anything unknown or "general"
-    return "normal"
+    return CATEGORY_PRIORITY.get((category or "").lower(), DEFAULT_PRIORITY)
 
 
-def call_llama_knowledge_answer(question: str, contexts: List[dict]) -> str:
-    """Use the unified LLM helper (Ollama locally, Groq in production) to answer
-    a support question given a list of KB context chunks."""
+def build_knowledge_prompt(question: str, contexts: List[dict]) -> tuple[str, str]:
+    """Build the (system_prompt, user_message) pair for a KB-grounded answer."""
 
     context_texts = []
     for idx, c in enumerate(contexts, start=1):
@@ -196,7 +447,7 @@ def call_llama_knowledge_answer(question: str, contexts: List[dict]) -> str:
         content = c.get("content") or ""
         context_texts.append(f"Source {idx} - {title}:\n{content}")
 
-    full_context = "\n\n".join(context_texts)
+    full_context = "\n\n".join(context_texts)[:MAX_CONTEXT_CHARS]
 
     system_prompt = (
         "You are a helpful support agent. Answer the user's question using only the "
@@ -209,9 +460,40 @@ def call_llama_knowledge_answer(question: str, contexts: List[dict]) -> str:
         "Relevant documentation (sources):\n" + full_context
     )
 
+    return system_prompt, user_message
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def cached_search_kb(question: str, top_k: int = 5) -> List[dict]:
+    """search_kb (in a worker thread), cached by question for a few minutes."""
+    key = (_text_key(question), top_k)
+    kb_results = _kb_results_cache.get(key)
+    if kb_results is None:
+        kb_results = await asyncio.to_thread(search_kb, question, top_k)
+        _kb_results_cache.set(key, kb_results)
+    return kb_results
+
+
+async def call_llama_knowledge_answer(question: str, contexts: List[dict]) -> str:
+    """Use the unified LLM helper (Ollama locally, Groq in production) to answer
+    a support question given a list of KB context chunks.
+
+    Successful answers are cached by (question, sources)."""
+
+    system_prompt, user_message = build_knowledge_prompt(question, contexts)
+    key = _text_key(user_message)
+
+    cached = _answer_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        result = call_llm(user_message, system_prompt)
+        result = await call_llm_async(user_message, system_prompt)
         if result:
+            _answer_cache.set(key, result)
             return result
     except Exception as e:
         return (
@@ -219,7 +501,139 @@ def call_llama_knowledge_answer(question: str, contexts: List[dict]) -> str:
             "Please check the LLM server configuration. Error: " + str(e)
         )
 
-    return "AI answer is not available right now. No response from the model."
+    return NO_ANSWER_TEXT
+
+
+def load_ticket_question(ticket_id: str, body: Optional[TicketAnswerRequest]) -> str:
+    """Question to answer for a ticket: the explicit one, or subject + description."""
+
+    ticket_res = supabase.table("tickets").select("id, subject, description").eq("id", ticket_id).execute()
+    if not ticket_res.data:
+        raise HTTPException(404, "Ticket not found")
+
+    t = ticket_res.data[0]
+    subject = t.get("subject") or "Support question"
+    description = t.get("description") or ""
+
+    if body and body.question:
+        return body.question
+    return f"Customer ticket: {subject}. Details: {description}"
+
+
+def save_ai_answer(ticket_id: str, answer_text: str, kb_results: List[dict]) -> None:
+    """Store the AI answer on the ticket, auto-resolve if the KB match is strong,
+    and log the action to ticket_history."""
+
+    top_score = 0.0
+    if kb_results:
+        try:
+            top_score = float(kb_results[0].get("score") or 0.0)
+        except Exception:
+            top_score = 0.0
+
+    high_confidence = top_score >= 0.85
+    now = utc_now_iso()
+
+    update_data = {
+        "resolution": answer_text,
+        "updated_at": now,
+    }
+    if high_confidence:
+        update_data["status"] = "resolved"
+        update_data["resolved_at"] = now
+        update_data["needs_human_review"] = False
+    else:
+        # AI answer exists but either low confidence or status not auto-resolved
+        update_data["needs_human_review"] = True
+
+    supabase.table("tickets").update(update_data).eq("id", ticket_id).execute()
+
+    if high_confidence:
+        action = "auto_resolved"
+        comment = "Ticket auto-resolved by AI answer (RAG)"
+        new_values = {"status": "resolved"}
+    else:
+        action = "auto_answered"
+        comment = "AI answer generated (status unchanged)"
+        new_values = {}
+
+    history_data = {
+        "ticket_id": ticket_id,
+        "action": action,
+        "comment": comment,
+        "new_values": new_values,
+        "created_at": now,
+    }
+    log_history(history_data)
+
+
+def answer_sources(kb_results: List[dict]) -> List[dict]:
+    """Simple sources list returned alongside an AI answer."""
+    return [
+        {
+            "content": r.get("content"),
+            "article_title": r.get("article_title"),
+            "article_category": r.get("article_category"),
+            "score": r.get("score"),
+        }
+        for r in kb_results
+    ]
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def _ticket_counts() -> dict:
+    """Return the five /stats counts, in one round trip when possible."""
+    try:
+        response = supabase.rpc("get_ticket_stats").execute()
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        return {key: int(row[key] or 0) for key in TICKET_STAT_KEYS}
+    except Exception:
+        # get_ticket_stats RPC not installed yet: one count query per value
+        pass
+
+    def count(**filters) -> int:
+        query = supabase.table("tickets").select("id", count="exact")
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query.execute().count or 0
+
+    return {
+        "total_tickets": count(),
+        "open_tickets": count(status="open"),
+        "resolved_tickets": count(status="resolved"),
+        "needs_human_review": count(needs_human_review=True),
+        # Resolved AND does not need human review
+        "resolved_by_ai": count(status="resolved", needs_human_review=False),
+    }
+
+
+def tickets_etag(scope: str, **filters) -> str:
+    """ETag for a view over `tickets`: changes whenever a matching row is
+    added, removed or updated.
+
+    Built from the row count and newest `updated_at` (one indexed query,
+    much cheaper than the view itself), plus the view's name and filters.
+    Every write in this API bumps `updated_at`.
+    """
+    query = supabase.table("tickets").select("updated_at", count="exact")
+    for column, value in filters.items():
+        if value is not None:
+            query = query.eq(column, value)
+    res = query.order("updated_at", desc=True).limit(1).execute()
+
+    latest = res.data[0]["updated_at"] if res.data else ""
+    version = f"{scope}:{sorted(filters.items())}:{res.count}:{latest}"
+    return '"' + _text_key(version) + '"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True if the client's cached copy (If-None-Match) is still current."""
+    return request.headers.get("if-none-match") == etag
 
 
 # ─────────────────────────────────────────────────────────────────────────
@@ -239,15 +653,18 @@ async def create_ticket(ticket: TicketCreate):
         raise HTTPException(500, "Database not configured")
     
     try:
-        # 1. Get or create customer
-        customer = get_or_create_customer(ticket.customer_email)
+        now = utc_now_iso()
 
-        # 2. Build a single text string for the classifier
+        # 1. Build a single text string for the classifier
         #    (subject + description gives better context)
         classification_text = f"{ticket.subject}. {ticket.description}"
 
-        # 3. Use RoBERTa model to predict CATEGORY + CONFIDENCE
-        classification_result = classify_ticket_with_confidence(classification_text)
+        # 2-3. Get or create customer while RoBERTa predicts CATEGORY +
+        #      CONFIDENCE (independent, so they run side by side)
+        customer, classification_result = await asyncio.gather(
+            asyncio.to_thread(get_or_create_customer, ticket.customer_email),
+            classify_async(classification_text),
+        )
         predicted_category = classification_result["category"]
         ai_confidence = classification_result["confidence"]
 
@@ -266,46 +683,30 @@ async def create_ticket(ticket: TicketCreate):
             "priority": final_priority,
             "status": "open",
             "confidence": ai_confidence,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
+            "created_at": now,
+            "updated_at": now
         }
         
-        response = supabase.table("tickets").insert(ticket_data).execute()
+        response = await run_query(supabase.table("tickets").insert(ticket_data))
         
         if not response.data:
             raise HTTPException(500, "Failed to create ticket")
         
         new_ticket = response.data[0]
 
-        # 6. Log creation to history
+        # 6. Log creation to history (batched in the background)
         history_data = {
             "ticket_id": new_ticket["id"],
             "action": "created",
             "comment": "Ticket created via API",
             "new_values": {"status": "open", "channel": ticket.channel},
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": now
         }
         
-        supabase.table("ticket_history").insert(history_data).execute()
+        log_history(history_data)
 
         # 7. Build response (no auto-answer, user will manually call /answer endpoint)
-        return TicketResponse(
-            id=str(new_ticket["id"]),
-            customer_id=str(customer["id"]),
-            customer_email=customer["email"],
-            customer_name=customer["name"],
-            subject=new_ticket["subject"],
-            description=new_ticket["description"],
-            channel=new_ticket["channel"],
-            category=new_ticket.get("category"),
-            priority=new_ticket["priority"],
-            status=new_ticket["status"],
-            resolution=new_ticket.get("resolution"),
-            needs_human_review=new_ticket.get("needs_human_review"),
-            created_at=new_ticket["created_at"],
-            updated_at=new_ticket["updated_at"],
-            confidence=new_ticket.get("confidence"),
-        )
+        return ticket_response_from_row(new_ticket, customer)
         
     except Exception as e:
         raise HTTPException(500, f"Error creating ticket: {str(e)}")
@@ -339,14 +740,17 @@ async def ingest_email(email: EmailIngestRequest):
         raise HTTPException(500, "Database not configured")
     
     try:
-        # 1. Get or create customer from email sender
-        customer = get_or_create_customer(email.from_email)
+        now = utc_now_iso()
         
-        # 2. Build classification text from email content
+        # 1. Build classification text from email content
         classification_text = f"{email.subject}. {email.body}"
         
-        # 3. Use RoBERTa to predict category + CONFIDENCE
-        classification_result = classify_ticket_with_confidence(classification_text)
+        # 2-3. Get or create customer from email sender while RoBERTa
+        #      predicts category + CONFIDENCE
+        customer, classification_result = await asyncio.gather(
+            asyncio.to_thread(get_or_create_customer, email.from_email),
+            classify_async(classification_text),
+        )
         predicted_category = classification_result["category"]
         ai_confidence = classification_result["confidence"]
         
@@ -363,19 +767,19 @@ async def ingest_email(email: EmailIngestRequest):
             "priority": final_priority,
             "status": "open",
             "confidence": ai_confidence,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
+            "created_at": now,
+            "updated_at": now
         }
         
         # 6. Insert ticket into Supabase
-        response = supabase.table("tickets").insert(ticket_data).execute()
+        response = await run_query(supabase.table("tickets").insert(ticket_data))
         
         if not response.data:
             raise HTTPException(500, "Failed to create ticket from email")
         
         new_ticket = response.data[0]
         
-        # 7. Log to history (mark as created from email)
+        # 7. Log to history, batched in the background (mark as created from email)
         history_data = {
             "ticket_id": new_ticket["id"],
             "action": "created",
@@ -385,29 +789,13 @@ async def ingest_email(email: EmailIngestRequest):
                 "channel": "email",
                 "message_id": email.message_id
             },
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": now
         }
         
-        supabase.table("ticket_history").insert(history_data).execute()
+        log_history(history_data)
         
         # 8. Return ticket response
-        return TicketResponse(
-            id=str(new_ticket["id"]),
-            customer_id=str(customer["id"]),
-            customer_email=customer["email"],
-            customer_name=customer["name"],
-            subject=new_ticket["subject"],
-            description=new_ticket["description"],
-            channel=new_ticket["channel"],
-            category=new_ticket.get("category"),
-            priority=new_ticket["priority"],
-            status=new_ticket["status"],
-            resolution=new_ticket.get("resolution"),
-            needs_human_review=new_ticket.get("needs_human_review"),
-            created_at=new_ticket["created_at"],
-            updated_at=new_ticket["updated_at"],
-            confidence=new_ticket.get("confidence"),
-        )
+        return ticket_response_from_row(new_ticket, customer)
         
     except Exception as e:
         raise HTTPException(500, f"Error ingesting email: {str(e)}")
@@ -415,21 +803,27 @@ async def ingest_email(email: EmailIngestRequest):
 
 @router.get("/", response_model=List[TicketResponse])
 async def list_tickets(
+    request: Request,
     status: Optional[str] = Query(None, description="Filter by status"),
     priority: Optional[str] = Query(None, description="Filter by priority"),
     limit: int = Query(50, le=100, description="Number of tickets")
 ):
     """
     List tickets with optional filters
+
+    Supports conditional GET: polling clients that send back the ETag in
+    If-None-Match get a 304 while nothing has changed.
     """
     if not supabase:
         raise HTTPException(500, "Database not configured")
     
     try:
+        etag = await asyncio.to_thread(tickets_etag, f"list:{limit}", status=status, priority=priority)
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
         # Build query
-        query = supabase.table("tickets").select(
-            "*, customers(email, name)"
-        )
+        query = supabase.table("tickets").select(TICKET_COLUMNS)
         
         if status:
             query = query.eq("status", status)
@@ -439,30 +833,10 @@ async def list_tickets(
         
         query = query.order("created_at", desc=True).limit(limit)
         
-        response = query.execute()
+        response = await run_query(query)
         
         # Format response
-        tickets = []
-        for t in response.data:
-            customer = t.get("customers", {})
-            tickets.append(TicketResponse(
-                id=str(t["id"]),
-                customer_id=str(t["customer_id"]) if t.get("customer_id") else None,
-                customer_email=customer.get("email") if customer else None,
-                customer_name=customer.get("name") if customer else None,
-                subject=t["subject"],
-                description=t["description"],
-                channel=t["channel"],
-                category=t.get("category"),
-                priority=t["priority"],
-                status=t["status"],
-                resolution=t.get("resolution"),
-                needs_human_review=t.get("needs_human_review"),
-                created_at=t["created_at"],
-                updated_at=t["updated_at"]
-            ))
-        
-        return tickets
+        return ticket_list_response(response.data, headers={"ETag": etag})
         
     except Exception as e:
         raise HTTPException(500, f"Error listing tickets: {str(e)}")
@@ -482,153 +856,80 @@ async def list_escalated_tickets(limit: int = Query(50, le=100, description="Num
         query = (
             supabase
             .table("tickets")
-            .select("*, customers(email, name)")
+            .select(TICKET_COLUMNS)
             .eq("needs_human_review", True)
             .order("created_at", desc=True)
             .limit(limit)
         )
 
-        response = query.execute()
-
-        tickets: List[TicketResponse] = []
-        for t in response.data:
-            customer = t.get("customers", {})
-            tickets.append(
-                TicketResponse(
-                    id=str(t["id"]),
-                    customer_id=str(t["customer_id"]) if t.get("customer_id") else None,
-                    customer_email=customer.get("email") if customer else None,
-                    customer_name=customer.get("name") if customer else None,
-                    subject=t["subject"],
-                    description=t["description"],
-                    channel=t["channel"],
-                    category=t.get("category"),
-                    priority=t["priority"],
-                    status=t["status"],
-                    resolution=t.get("resolution"),
-                    needs_human_review=t.get("needs_human_review"),
-                    created_at=t["created_at"],
-                    updated_at=t["updated_at"],
-                )
-            )
-
-        return tickets
+        response = await run_query(query)
+
+        return ticket_list_response(response.data)
 
     except Exception as e:
         raise HTTPException(500, f"Error listing escalated tickets: {str(e)}")
 
 
 @router.get("/stats")
-async def get_ticket_stats():
+async def get_ticket_stats(request: Request, response: Response):
     """Return high-level ticket statistics for admin/monitoring views.
 
     All values are computed directly from the database so that the metrics
-    always reflect the latest state.
+    always reflect the latest state (one `get_ticket_stats()` call, see
+    database/ticket_optimizations.sql). Dashboards that send back the ETag
+    get a 304 without the counts being recomputed.
     """
 
     if not supabase:
         raise HTTPException(500, "Database not configured")
 
     try:
-        # Total tickets
-        total_res = supabase.table("tickets").select("id", count="exact").execute()
-        total_tickets = total_res.count or 0
-
-        # Open tickets (status = 'open')
-        open_res = (
-            supabase.table("tickets")
-            .select("id", count="exact")
-            .eq("status", "open")
-            .execute()
-        )
-        open_tickets = open_res.count or 0
-
-        # Resolved tickets (status = 'resolved')
-        resolved_res = (
-            supabase.table("tickets")
-            .select("id", count="exact")
-            .eq("status", "resolved")
-            .execute()
-        )
-        resolved_tickets = resolved_res.count or 0
-
-        # Tickets that currently need human review
-        nhr_res = (
-            supabase.table("tickets")
-            .select("id", count="exact")
-            .eq("needs_human_review", True)
-            .execute()
-        )
-        needs_human_review = nhr_res.count or 0
-
-        # Tickets resolved by AI: resolved AND does not need human review
-        resolved_ai_res = (
-            supabase.table("tickets")
-            .select("id", count="exact")
-            .eq("status", "resolved")
-            .eq("needs_human_review", False)
-            .execute()
-        )
-        resolved_by_ai = resolved_ai_res.count or 0
-
-        return {
-            "total_tickets": total_tickets,
-            "open_tickets": open_tickets,
-            "resolved_tickets": resolved_tickets,
-            "needs_human_review": needs_human_review,
-            "resolved_by_ai": resolved_by_ai,
-        }
+        etag = await asyncio.to_thread(tickets_etag, "stats")
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
 
+        return await asyncio.to_thread(_ticket_counts)
     except Exception as e:
         raise HTTPException(500, f"Error computing ticket stats: {str(e)}")
 
 
 @router.get("/{ticket_id}", response_model=TicketResponse)
-async def get_ticket(ticket_id: str):
+async def get_ticket(
+    ticket_id: str,
+    recompute_confidence: bool = Query(False, description="Re-score confidence against the KB"),
+):
     """
     Get a single ticket by ID
+
+    `confidence` is the value stored when the ticket was classified. Pass
+    `recompute_confidence=true` to compute it from the best KB match instead.
     """
     if not supabase:
         raise HTTPException(500, "Database not configured")
     
     try:
-        response = supabase.table("tickets").select(
-            "*, customers(email, name)"
-        ).eq("id", ticket_id).execute()
+        response = await run_query(supabase.table("tickets").select(TICKET_COLUMNS).eq("id", ticket_id))
         
         if not response.data:
             raise HTTPException(404, "Ticket not found")
         
         t = response.data[0]
-        customer = t.get("customers", {})
 
-        # Compute confidence score on the fly using KB
-        confidence: Optional[float] = None
-        try:
-            question = f"{t['subject']}. {t['description']}"
-            kb_results = search_kb(question, top_k=1)
-            if kb_results:
-                confidence = float(kb_results[0].get("score") or 0.0)
-        except Exception:
-            confidence = None
-
-        return TicketResponse(
-            id=str(t["id"]),
-            customer_id=str(t["customer_id"]) if t.get("customer_id") else None,
-            customer_email=customer.get("email") if customer else None,
-            customer_name=customer.get("name") if customer else None,
-            subject=t["subject"],
-            description=t["description"],
-            channel=t["channel"],
-            category=t.get("category"),
-            priority=t["priority"],
-            status=t["status"],
-            resolution=t.get("resolution"),
-            needs_human_review=t.get("needs_human_review"),
-            created_at=t["created_at"],
-            updated_at=t["updated_at"],
-            confidence=confidence,
-        )
+        confidence: Optional[float] = t.get("confidence")
+
+        # Re-score against the KB only when asked: it costs an embedding +
+        # vector search, and the stored value is enough for the detail view
+        if recompute_confidence:
+            try:
+                question = f"{t['subject']}. {t['description']}"
+                kb_results = await asyncio.to_thread(search_kb, question, 1)
+                if kb_results:
+                    confidence = float(kb_results[0].get("score") or 0.0)
+            except Exception:
+                pass
+
+        return ticket_response_from_row(t, confidence=confidence)
         
     except HTTPException:
         raise
@@ -640,19 +941,25 @@ async def get_ticket(ticket_id: str):
 async def update_ticket(ticket_id: str, updates: TicketUpdate):
     """
     Update a ticket (partial update)
+
+    Two round trips: a compact SELECT for the old status (history) and the
+    customer, then the UPDATE, which returns the updated row.
     """
     if not supabase:
         raise HTTPException(500, "Database not configured")
     
     try:
-        # Get current ticket
-        current = supabase.table("tickets").select("*").eq("id", ticket_id).execute()
+        # Get current status + customer
+        current = await run_query(
+            supabase.table("tickets").select("status, customers(email, name)").eq("id", ticket_id)
+        )
         
         if not current.data:
             raise HTTPException(404, "Ticket not found")
         
         # Build update data
-        update_data = {"updated_at": datetime.utcnow().isoformat()}
+        now = utc_now_iso()
+        update_data = {"updated_at": now}
         
         if updates.subject is not None:
             update_data["subject"] = updates.subject
@@ -661,9 +968,9 @@ async def update_ticket(ticket_id: str, updates: TicketUpdate):
         if updates.status is not None:
             update_data["status"] = updates.status
             if updates.status == "resolved":
-                update_data["resolved_at"] = datetime.utcnow().isoformat()
+                update_data["resolved_at"] = now
             elif updates.status == "closed":
-                update_data["closed_at"] = datetime.utcnow().isoformat()
+                update_data["closed_at"] = now
         if updates.priority is not None:
             update_data["priority"] = updates.priority
         if updates.resolution is not None:
@@ -671,11 +978,12 @@ async def update_ticket(ticket_id: str, updates: TicketUpdate):
         if updates.needs_human_review is not None:
             update_data["needs_human_review"] = updates.needs_human_review
         
-        # Update ticket
-        response = supabase.table("tickets").update(update_data).eq("id", ticket_id).execute()
+        # Update ticket (PostgREST returns the updated row)
+        response = await run_query(supabase.table("tickets").update(update_data).eq("id", ticket_id))
         
         if not response.data:
-            raise HTTPException(500, "Failed to update ticket")
+            # Deleted between the SELECT and the UPDATE
+            raise HTTPException(404, "Ticket not found")
         
         # Log to history
         history_data = {
@@ -684,13 +992,13 @@ async def update_ticket(ticket_id: str, updates: TicketUpdate):
             "comment": "Ticket updated via API",
             "old_values": {"status": current.data[0]["status"]},
             "new_values": update_data,
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": now
         }
         
-        supabase.table("ticket_history").insert(history_data).execute()
+        log_history(history_data)
         
         # Return updated ticket
-        return await get_ticket(ticket_id)
+        return ticket_response_from_row(response.data[0], current.data[0].get("customers") or {})
         
     except HTTPException:
         raise
@@ -707,12 +1015,14 @@ async def delete_ticket(ticket_id: str):
         raise HTTPException(500, "Database not configured")
     
     try:
+        now = utc_now_iso()
         update_data = {
             "status": "closed",
-            "closed_at": datetime.utcnow().isoformat()
+            "closed_at": now,
+            "updated_at": now
         }
         
-        response = supabase.table("tickets").update(update_data).eq("id", ticket_id).execute()
+        response = await run_query(supabase.table("tickets").update(update_data).eq("id", ticket_id))
         
         if not response.data:
             raise HTTPException(404, "Ticket not found")
@@ -734,9 +1044,9 @@ async def get_ticket_history(ticket_id: str):
         raise HTTPException(500, "Database not configured")
     
     try:
-        response = supabase.table("ticket_history").select(
+        response = await run_query(supabase.table("ticket_history").select(
             "*, users(display_name)"
-        ).eq("ticket_id", ticket_id).order("created_at", desc=True).execute()
+        ).eq("ticket_id", ticket_id).order("created_at", desc=True))
         
         return {
             "ticket_id": ticket_id,
@@ -762,86 +1072,74 @@ async def answer_ticket(ticket_id: str, body: TicketAnswerRequest | None = None)
     if not supabase:
         raise HTTPException(500, "Database not configured")
 
-    # 1. Load ticket from Supabase
-    ticket_res = supabase.table("tickets").select("id, subject, description").eq("id", ticket_id).execute()
-    if not ticket_res.data:
-        raise HTTPException(404, "Ticket not found")
+    # 1-2. Load ticket and decide which question text to use
+    question = await asyncio.to_thread(load_ticket_question, ticket_id, body)
 
-    t = ticket_res.data[0]
-    subject = t.get("subject") or "Support question"
-    description = t.get("description") or ""
-
-    # 2. Decide which question text to use
-    user_question = (body.question if body and body.question else None)
-    if user_question:
-        question = user_question
-    else:
-        question = f"Customer ticket: {subject}. Details: {description}"
-
-    # 3. Retrieve top KB chunks related to this question
-    kb_results = search_kb(question, top_k=5)
+    # 3. Retrieve top KB chunks related to this question (cached)
+    kb_results = await cached_search_kb(question, top_k=5)
 
     # 4. Call local Llama model to generate an answer
-    answer_text = call_llama_knowledge_answer(question, kb_results)
+    answer_text = await call_llama_knowledge_answer(question, kb_results)
 
-    # 5. Update the ticket with the AI answer and maybe auto-resolve
-    top_score = 0.0
-    if kb_results:
-        try:
-            top_score = float(kb_results[0].get("score") or 0.0)
-        except Exception:
-            top_score = 0.0
+    # 5-6. Update the ticket (maybe auto-resolve) and log to history
+    await asyncio.to_thread(save_ai_answer, ticket_id, answer_text, kb_results)
 
-    high_confidence = top_score >= 0.85
+    # 7. Return the answer with the sources used
+    return TicketAnswerResponse(
+        ticket_id=str(ticket_id),
+        answer=answer_text,
+        sources=answer_sources(kb_results),
+    )
 
-    update_data = {
-        "resolution": answer_text,
-        "updated_at": datetime.utcnow().isoformat(),
-    }
-    if high_confidence:
-        update_data["status"] = "resolved"
-        update_data["resolved_at"] = datetime.utcnow().isoformat()
-        update_data["needs_human_review"] = False
-    else:
-        # AI answer exists but either low confidence or status not auto-resolved
-        update_data["needs_human_review"] = True
 
-    supabase.table("tickets").update(update_data).eq("id", ticket_id).execute()
+@router.post("/{ticket_id}/answer/stream")
+async def stream_ticket_answer(ticket_id: str, body: TicketAnswerRequest | None = None):
+    """Same as `/answer`, but streams the answer as Server-Sent Events.
 
-    # 6. Log AI answer to history
-    if high_confidence:
-        action = "auto_resolved"
-        comment = "Ticket auto-resolved by AI answer (RAG)"
-        new_values = {"status": "resolved"}
-    else:
-        action = "auto_answered"
-        comment = "AI answer generated (status unchanged)"
-        new_values = {}
+    The UI can show text as soon as the model produces its first token
+    instead of waiting for the full generation.
 
-    history_data = {
-        "ticket_id": ticket_id,
-        "action": action,
-        "comment": comment,
-        "new_values": new_values,
-        "created_at": datetime.utcnow().isoformat(),
-    }
-    supabase.table("ticket_history").insert(history_data).execute()
+    Events:
+    - `data: {"content": "..."}` for each piece of the answer
+    - `event: done` with `{"ticket_id", "answer", "sources"}` at the end,
+      after the ticket has been updated
+    """
 
-    # 7. Prepare simple sources list for the response
-    sources = [
-        {
-            "content": r.get("content"),
-            "article_title": r.get("article_title"),
-            "article_category": r.get("article_category"),
-            "score": r.get("score"),
-        }
-        for r in kb_results
-    ]
+    if not supabase:
+        raise HTTPException(500, "Database not configured")
 
-    return TicketAnswerResponse(
-        ticket_id=str(ticket_id),
-        answer=answer_text,
-        sources=sources,
+    question = await asyncio.to_thread(load_ticket_question, ticket_id, body)
+    kb_results = await cached_search_kb(question, top_k=5)
+    system_prompt, user_message = build_knowledge_prompt(question, kb_results)
+    cached_answer = _answer_cache.get(_text_key(user_message))
+
+    async def event_stream():
+        parts: List[str] = []
+        if cached_answer is not None:
+            # Same question and sources answered recently: no generation
+            parts.append(cached_answer)
+            yield sse_event({"content": cached_answer})
+        else:
+            async for piece in stream_llm_async(user_message, system_prompt):
+                parts.append(piece)
+                yield sse_event({"content": piece})
+
+        answer_text = "".join(parts).strip()
+        if not answer_text:
+            answer_text = NO_ANSWER_TEXT
+            yield sse_event({"content": answer_text})
+
+        await asyncio.to_thread(save_ai_answer, ticket_id, answer_text, kb_results)
+
+        yield sse_event(
+            {"ticket_id": str(ticket_id), "answer": answer_text, "sources": answer_sources(kb_results)},
+            event="done",
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -850,33 +1148,15 @@ async def get_ticket_messages(ticket_id: str):
     """Return all messages for a given ticket.
 
     **Simplified demo implementation**
-    - Uses an in-memory dictionary instead of a database table.
+    - Uses Redis (REDIS_URL) or an in-memory dictionary instead of a
+      database table.
     - Good enough to demonstrate a working chat UI.
     """
 
-    raw_messages = IN_MEMORY_MESSAGES.get(str(ticket_id), [])
-    results: List[TicketMessageResponse] = []
-    for m in raw_messages:
-        results.append(
-            TicketMessageResponse(
-                id=str(m["id"]),
-                ticket_id=str(m["ticket_id"]),
-                sender_type=m.get("sender_type") or "customer",
-                sender_id=m.get("sender_id"),
-                sender_name=m.get("sender_name") or "User",
-                sender_avatar=m.get("sender_avatar"),
-                content=m.get("content") or "",
-                content_type=m.get("content_type") or "text",
-                is_ai_generated=bool(m.get("is_ai_generated") or False),
-                ai_suggested=bool(m.get("ai_suggested") or False),
-                is_read=bool(m.get("is_read") or True),
-                read_at=m.get("read_at"),
-                created_at=m.get("created_at") or datetime.utcnow().isoformat(),
-                updated_at=m.get("updated_at") or datetime.utcnow().isoformat(),
-            )
-        )
-
-    return results
+    raw_messages = await load_messages(str(ticket_id))
+    now = utc_now_iso()
+    messages = _message_list_adapter.validate_python([message_dict_from_stored(m, now) for m in raw_messages])
+    return ORJSONResponse(_message_list_adapter.dump_python(messages, mode="json"))
 
 
 @router.post("/{ticket_id}/messages", response_model=TicketMessageResponse, status_code=201)
@@ -885,14 +1165,14 @@ async def create_ticket_message(ticket_id: str, body: TicketMessageCreate):
 
     **Simplified demo implementation**
     - Does not write to the database.
-    - Stores messages in memory so the chat UI works for now.
+    - Stores messages in Redis (or in memory) so the chat UI works for now.
     """
 
-    now = datetime.utcnow().isoformat()
+    now = utc_now_iso()
     ticket_id_str = str(ticket_id)
 
     message_dict = {
-        "id": str(uuid4()),
+        "id": uuid4().hex,
         "ticket_id": ticket_id_str,
         "sender_type": body.sender_type or "agent",
         "sender_id": body.sender_id,
@@ -908,7 +1188,8 @@ async def create_ticket_message(ticket_id: str, body: TicketMessageCreate):
         "updated_at": now,
     }
 
-    # Append to in-memory store
-    IN_MEMORY_MESSAGES.setdefault(ticket_id_str, []).append(message_dict)
+    # Append to the message store (Redis, or in memory)
+    await append_message(ticket_id_str, message_dict)
 
-    return TicketMessageResponse(**message_dict)
+    message = TicketMessageResponse.model_validate(message_dict)
+    return ORJSONResponse(message.model_dump(mode="json"), status_code=201)
@@ -7,6 +7,7 @@ This script:
 - Uses a small validation set to track accuracy
 - Trains for up to 10 epochs with early stopping when accuracy stops improving
 - Saves the trained model to models/roberta_ticket_category
+- Rebuilds the int8 ONNX copy the API serves on CPU (see export_roberta_onnx)
 
 Run from the clara-backend folder:
     python -m agents.support_agent.train_roberta_classifier
@@ -19,21 +20,23 @@ Requirements (already installed earlier):
 """
 
 import os
+import shutil
 from typing import List
 
 # IMPORTANT: tell transformers to use ONLY PyTorch (no TensorFlow)
 os.environ["TRANSFORMERS_NO_TF"] = "1"
 os.environ["USE_TF"] = "0"
 
+import numpy as np
 import pandas as pd
 import torch
 from sklearn.metrics import accuracy_score, f1_score
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
 from torch.utils.data import Dataset
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
+    DataCollatorWithPadding,
+    EarlyStoppingCallback,
     Trainer,
     TrainingArguments,
 )
@@ -47,14 +50,33 @@ DATA_PATH = "training_data/ticket_classification_roberta.csv"
 OUTPUT_DIR = "models/roberta_ticket_category"
 
 NUM_EPOCHS = 10  # maximum epochs (early stopping will stop earlier if needed)
-BATCH_SIZE = 8
+EARLY_STOPPING_PATIENCE = 2  # epochs without a better validation accuracy
+BATCH_SIZE = 16  # micro-batch that has to fit in memory
+EFFECTIVE_BATCH_SIZE = 64  # samples per optimizer step (via gradient accumulation)
 LR = 2e-5
 MAX_LENGTH = 128
 
+# Lower encoder layers (of 12) kept frozen along with the embeddings; the
+# top layers + classifier head carry the category-specific signal
+FROZEN_LAYERS = 8
+
+# Background workers assembling/padding batches while the model trains
+DATALOADER_WORKERS = min(8, os.cpu_count() or 2)
+
 # Detect device (GPU if available)
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(f"Using device: {device}")
 
+# Mixed precision on GPU: bf16 on Ampere+ (compute capability >= 8.0),
+# fp16 on older cards. CPU training stays in fp32.
+USE_BF16 = torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8
+USE_FP16 = torch.cuda.is_available() and not USE_BF16
+
+if USE_BF16:
+    # Let the remaining fp32 matmuls use TF32 tensor cores as well
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
 
 # ========================
 # 2. Dataset definition
@@ -66,33 +88,36 @@ class TicketDataset(Dataset):
     Each row has:
     - text: subject + description
     - label: category index (0..N-1)
+
+    All texts are tokenized once, in one batched call, when the dataset is
+    built. Training then only indexes the stored token lists instead of
+    re-tokenizing every sample in every epoch.
+
+    Samples are NOT padded here: the data collator pads each mini-batch to
+    its own longest sample, so short tickets don't pay for MAX_LENGTH.
     """
 
     def __init__(self, texts: List[str], labels: List[int], tokenizer, max_length: int = 128):
-        self.texts = texts
-        self.labels = labels
-        self.tokenizer = tokenizer
-        self.max_length = max_length
+        encoding = tokenizer(
+            list(texts),
+            truncation=True,
+            padding=False,
+            max_length=max_length,
+        )
+        self.input_ids = encoding["input_ids"]
+        self.attention_mask = encoding["attention_mask"]
+        # One long tensor up front; __getitem__ returns views into it
+        self.labels = torch.as_tensor(labels, dtype=torch.long)
 
     def __len__(self):
-        return len(self.texts)
+        return len(self.labels)
 
     def __getitem__(self, idx):
-        text = self.texts[idx]
-        label = int(self.labels[idx])
-
-        # Tokenize the text for RoBERTa
-        encoding = self.tokenizer(
-            text,
-            truncation=True,
-            padding="max_length",
-            max_length=self.max_length,
-            return_tensors="pt",
-        )
-
-        item = {key: val.squeeze(0) for key, val in encoding.items()}
-        item["labels"] = torch.tensor(label, dtype=torch.long)
-        return item
+        return {
+            "input_ids": self.input_ids[idx],
+            "attention_mask": self.attention_mask[idx],
+            "labels": self.labels[idx],
+        }
 
 
 # ========================
@@ -120,16 +145,17 @@ def load_data(path: str):
     texts = df["text"].astype(str).tolist()
     categories = df["category"].astype(str).tolist()
 
-    # Encode string labels -> integers
-    label_encoder = LabelEncoder()
-    labels = label_encoder.fit_transform(categories)
+    # Encode string labels -> integers (sorted, same order LabelEncoder used)
+    label_classes = sorted(set(categories))
+    class_to_idx = {name: idx for idx, name in enumerate(label_classes)}
+    labels = np.fromiter((class_to_idx[c] for c in categories), dtype=np.int64, count=len(categories))
 
-    num_labels = len(label_encoder.classes_)
+    num_labels = len(label_classes)
     print("Categories:")
-    for idx, name in enumerate(label_encoder.classes_):
+    for idx, name in enumerate(label_classes):
         print(f"  {idx}: {name}")
 
-    return texts, labels, label_encoder, num_labels
+    return texts, labels, label_classes, num_labels
 
 
 def augment_data(texts: List[str], labels: List[int]):
@@ -139,51 +165,93 @@ def augment_data(texts: List[str], labels: List[int]):
     This gives the model more data without you editing hundreds of lines.
     """
 
-    augmented_texts = list(texts)
-    augmented_labels = list(labels)
-
     prefixes = ["Customer: ", "User report: ", "Issue: ", "Ticket: "]
 
-    for text, label in zip(texts, labels):
-        for p in prefixes:
-            augmented_texts.append(p + text)
-            augmented_labels.append(label)
+    # Originals first, then every prefixed variant of each sample
+    augmented_texts = list(texts) + [p + text for text in texts for p in prefixes]
+    augmented_labels = list(labels) + [label for label in labels for _ in prefixes]
 
     print(f"Original samples: {len(texts)}, augmented samples: {len(augmented_texts)}")
     return augmented_texts, augmented_labels
 
 
+def stratified_split(texts: List[str], labels, test_size: float = 0.2, seed: int = 42):
+    """Split into train/validation sets, keeping each category's share.
+
+    Each category's indices are shuffled and the first `test_size` of them
+    go to validation, all with numpy indexing. Returns
+    (X_train, X_val, y_train, y_val) like sklearn's train_test_split.
+    """
+    rng = np.random.default_rng(seed)
+    texts_arr = np.asarray(texts, dtype=object)
+    labels_arr = np.asarray(labels, dtype=np.int64)
+
+    train_parts, val_parts = [], []
+    for label in np.unique(labels_arr):
+        idx = rng.permutation(np.flatnonzero(labels_arr == label))
+        n_val = int(round(len(idx) * test_size))
+        val_parts.append(idx[:n_val])
+        train_parts.append(idx[n_val:])
+
+    # Shuffle across categories too, so samples are not grouped by label
+    train_idx = rng.permutation(np.concatenate(train_parts))
+    val_idx = rng.permutation(np.concatenate(val_parts))
+
+    return (
+        texts_arr[train_idx].tolist(),
+        texts_arr[val_idx].tolist(),
+        labels_arr[train_idx],
+        labels_arr[val_idx],
+    )
+
+
+def load_pretrained(loader, name: str, **kwargs):
+    """Load a HuggingFace tokenizer/model, from the local cache if possible.
+
+    After the first download, `local_files_only=True` skips the Hub
+    round trips `from_pretrained` otherwise makes on every run; a cache miss
+    falls back to a normal (online) load.
+    """
+    try:
+        return loader.from_pretrained(name, local_files_only=True, **kwargs)
+    except OSError:
+        return loader.from_pretrained(name, **kwargs)
+
+
 # ========================
 # 4. Main training function
 # ========================
 
 def main():
     # Load data
-    texts, labels, label_encoder, num_labels = load_data(DATA_PATH)
+    texts, labels, label_classes, num_labels = load_data(DATA_PATH)
 
     # Augment data in memory so the model sees many more examples
     texts, labels = augment_data(texts, labels)
 
     # Split into train and validation sets (to track accuracy)
-    X_train, X_val, y_train, y_val = train_test_split(
-        texts,
-        labels,
-        test_size=0.2,
-        stratify=labels,
-        random_state=42,
-    )
+    X_train, X_val, y_train, y_val = stratified_split(texts, labels, test_size=0.2, seed=42)
 
     # Load tokenizer and model
     print(f"Loading tokenizer and model: {MODEL_NAME}")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModelForSequenceClassification.from_pretrained(
+    # Fast (Rust) tokenizer: the batched dataset tokenization runs in parallel
+    tokenizer = load_pretrained(AutoTokenizer, MODEL_NAME, use_fast=True)
+    model = load_pretrained(
+        AutoModelForSequenceClassification,
         MODEL_NAME,
         num_labels=num_labels,
     )
 
+    # Freeze embeddings + lower layers: no backward pass or AdamW state for them
+    model.roberta.embeddings.requires_grad_(False)
+    for layer in model.roberta.encoder.layer[:FROZEN_LAYERS]:
+        layer.requires_grad_(False)
+
+    # Gradient checkpointing recomputes activations instead of caching them
+    model.config.use_cache = False
     model.to(device)
 
-    # Build datasets
+    # Build datasets (tokenized once, up front)
     train_dataset = TicketDataset(X_train, y_train, tokenizer, max_length=MAX_LENGTH)
     eval_dataset = TicketDataset(X_val, y_val, tokenizer, max_length=MAX_LENGTH)
 
@@ -192,10 +260,41 @@ def main():
         output_dir=OUTPUT_DIR,
         num_train_epochs=NUM_EPOCHS,
         per_device_train_batch_size=BATCH_SIZE,
+        gradient_accumulation_steps=max(1, EFFECTIVE_BATCH_SIZE // BATCH_SIZE),
+        # Trade ~20% recompute for much less activation memory (fits BATCH_SIZE=16)
+        gradient_checkpointing=True,
+        # Non-reentrant: the first trainable layer's input has no grad (frozen below it)
+        gradient_checkpointing_kwargs={"use_reentrant": False},
         learning_rate=LR,
         weight_decay=0.01,
+        # Lower beta2 adapts faster with the larger effective batch; the fused
+        # kernel updates all AdamW state in one CUDA launch per param group
+        optim="adamw_torch_fused" if torch.cuda.is_available() else "adamw_torch",
+        adam_beta1=0.9,
+        adam_beta2=0.95,
+        adam_epsilon=1e-8,
         logging_dir=os.path.join(OUTPUT_DIR, "logs"),
         logging_steps=10,
+        # Evaluate every epoch and keep the best checkpoint for early stopping
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        save_total_limit=2,
+        load_best_model_at_end=True,
+        metric_for_best_model="accuracy",
+        greater_is_better=True,
+        # Batch samples of similar length together so dynamic padding adds little
+        group_by_length=True,
+        fp16=USE_FP16,
+        bf16=USE_BF16,
+        tf32=USE_BF16 or None,
+        # Fuse the many small RoBERTa ops into compiled kernels (GPU only).
+        # Default mode: batch shapes vary with dynamic padding, which would
+        # keep re-recording CUDA graphs under "reduce-overhead".
+        torch_compile=torch.cuda.is_available(),
+        dataloader_num_workers=DATALOADER_WORKERS,
+        dataloader_pin_memory=torch.cuda.is_available(),
+        dataloader_persistent_workers=True,
+        dataloader_prefetch_factor=4,
     )
 
     # Metric function so Trainer can report accuracy / F1
@@ -212,7 +311,10 @@ def main():
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=eval_dataset,
+        # Pad per batch (to a multiple of 8 for tensor-core friendly shapes)
+        data_collator=DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8),
         compute_metrics=compute_metrics,
+        callbacks=[EarlyStoppingCallback(early_stopping_patience=EARLY_STOPPING_PATIENCE)],
     )
 
     print("Starting training...")
@@ -226,20 +328,31 @@ def main():
     for k, v in metrics.items():
         print(f"  {k}: {v:.4f}")
 
-    # Save model and label encoder
-    print("Saving model and label encoder...")
+    # Save model and label classes
+    print("Saving model and label classes...")
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     model.save_pretrained(OUTPUT_DIR)
     tokenizer.save_pretrained(OUTPUT_DIR)
 
-    # Save label encoder classes so we can map back from index -> label
+    # Save label classes so we can map back from index -> label
     classes_path = os.path.join(OUTPUT_DIR, "label_classes.txt")
     with open(classes_path, "w", encoding="utf-8") as f:
-        for cls in label_encoder.classes_:
+        for cls in label_classes:
             f.write(str(cls) + "\n")
 
     print("Training complete. Model saved to:", OUTPUT_DIR)
 
+    # The API serves an int8 ONNX copy on CPU. The one in onnx/ holds the
+    # previous weights, so drop it and rebuild it from the new ones
+    shutil.rmtree(os.path.join(OUTPUT_DIR, "onnx"), ignore_errors=True)
+    try:
+        from .export_roberta_onnx import main as export_onnx
+
+        export_onnx()
+    except ImportError as e:
+        print(f"Skipped the int8 ONNX export ({e}); the API will serve the PyTorch model.")
+        print("To build it later: python -m agents.support_agent.export_roberta_onnx")
+
 
 if __name__ == "__main__":
     main()
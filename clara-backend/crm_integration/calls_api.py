@@ -2,13 +2,65 @@
 Calls API - Track voice call interactions
 """
 
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from .supabase_client import get_supabase_client
 from utils.logger import get_logger
+from utils.postgrest import is_missing_function
+from utils.ttl_cache import TTLCache
 
 logger = get_logger("calls_api")
 
+# Call types shown in the Sales Hub (outbound kept for backward compatibility)
+AI_CALL_TYPES = ["ai_outbound", "ai_inbound", "outbound"]
+
+# Shared pool for Supabase requests that can run side by side (caps
+# concurrent requests so the HTTP connection pool is not saturated)
+CALLS_IO_WORKERS = 10
+_io_executor = ThreadPoolExecutor(max_workers=CALLS_IO_WORKERS, thread_name_prefix="calls-io")
+
+# Whether the append_call_note RPC is installed (None until first tried)
+_append_rpc_available: Optional[bool] = None
+
+# Rows per insert request in create_calls
+CALL_INSERT_CHUNK_SIZE = 1000
+
+# Optional columns of a new call (see CallsAPI._call_row)
+_OPTIONAL_CALL_FIELDS = {"user_id": None, "notes": None, "ai_session_id": None}
+
+# get_call results, briefly: call finalization reads the same record a few
+# times in a row. Writes through this API drop the entry before and after
+# writing, and bump the epoch so a get_call that overlapped the write does
+# not put the old row back.
+CALL_CACHE_TTL_SECONDS = 5
+_call_cache = TTLCache(maxsize=1024, ttl=CALL_CACHE_TTL_SECONDS)
+_call_cache_lock = threading.Lock()
+_call_cache_epoch = 0
+
+# Rows per request when paging through the Sales Hub call history
+AI_CALLS_PAGE_SIZE = 1000
+
+# Default columns for call lists (the transcript can be large; get_call
+# still returns the full record)
+CALL_LIST_FIELDS = "id,lead_id,user_id,call_type,outcome,duration,call_start_time,notes"
+
+# Columns list_ai_calls returns to the Sales Hub (transcript is shown there)
+AI_CALL_FIELDS = (
+    "id,lead_id,duration,call_type,outcome,notes,call_start_time,created_at,"
+    "transcript,lead_score_after,qualification_status,bant_assessment,ai_session_id"
+)
+
+
+def _invalidate_call(call_id: str) -> None:
+    """Drop a cached call and stop in-flight get_call reads from caching."""
+    global _call_cache_epoch
+    with _call_cache_lock:
+        _call_cache_epoch += 1
+        _call_cache.pop(call_id)
+
 
 class CallsAPI:
     """API for managing call records in Supabase CRM"""
@@ -42,18 +94,15 @@ class CallsAPI:
             Created call record or None if failed
         """
         try:
-            call_data = {
-                "lead_id": lead_id,
-                "user_id": user_id,
-                "call_type": call_type if is_ai_call else (call_type or "outbound"),
-                "outcome": "in_progress",  # Will be updated when call ends
-                "call_start_time": (call_start_time or datetime.utcnow()).isoformat(),
-                "notes": notes,
-                "ai_session_id": session_id,  # Now stored in dedicated column
-            }
-            
-            # Remove None values
-            call_data = {k: v for k, v in call_data.items() if v is not None}
+            call_data = self._call_row(
+                lead_id=lead_id,
+                user_id=user_id,
+                session_id=session_id,
+                call_type=call_type,
+                call_start_time=call_start_time,
+                notes=notes,
+                is_ai_call=is_ai_call
+            )
             
             result = self.client.table("calls").insert(call_data).execute()
             
@@ -68,6 +117,68 @@ class CallsAPI:
             logger.error(f"Error creating call: {e}")
             return None
     
+    def create_calls(
+        self,
+        calls: List[Dict[str, Any]],
+        chunk_size: int = CALL_INSERT_CHUNK_SIZE
+    ) -> List[Dict[str, Any]]:
+        """
+        Create many call records with one insert request per chunk
+        
+        Args:
+            calls: One dict per call, with the keyword arguments of create_call
+                   (lead_id required; user_id, session_id, call_type, ...)
+            chunk_size: Rows sent per insert request
+            
+        Returns:
+            Created call records (chunks that failed are logged and skipped)
+        """
+        created: List[Dict[str, Any]] = []
+        
+        for start in range(0, len(calls), chunk_size):
+            # PostgREST bulk inserts need the same keys on every row, so
+            # unset optional fields are sent as null
+            rows = [
+                {**_OPTIONAL_CALL_FIELDS, **self._call_row(**call)}
+                for call in calls[start:start + chunk_size]
+            ]
+            try:
+                result = self.client.table("calls").insert(rows).execute()
+                created.extend(result.data or [])
+            except Exception as e:
+                logger.error(f"Error creating calls {start}-{start + len(rows) - 1}: {e}")
+        
+        logger.info(f"Created {len(created)} of {len(calls)} call records")
+        return created
+    
+    @staticmethod
+    def _call_row(
+        lead_id: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        call_type: str = "ai_outbound",
+        call_start_time: Optional[datetime] = None,
+        notes: Optional[str] = None,
+        is_ai_call: bool = True
+    ) -> Dict[str, Any]:
+        """Insert payload for a new call (arguments as in create_call)"""
+        call_data = {
+            "lead_id": lead_id,
+            "call_type": call_type if is_ai_call else (call_type or "outbound"),
+            "outcome": "in_progress",  # Will be updated when call ends
+            "call_start_time": (call_start_time or datetime.utcnow()).isoformat(),
+        }
+        
+        # Optional fields are only sent when set
+        if user_id is not None:
+            call_data["user_id"] = user_id
+        if notes is not None:
+            call_data["notes"] = notes
+        if session_id is not None:
+            call_data["ai_session_id"] = session_id  # Now stored in dedicated column
+        
+        return call_data
+    
     def update_call(
         self,
         call_id: str,
@@ -87,7 +198,9 @@ class CallsAPI:
             # Add updated timestamp
             updates["updated_at"] = datetime.utcnow().isoformat()
             
+            _invalidate_call(call_id)
             result = self.client.table("calls").update(updates).eq("id", call_id).execute()
+            _invalidate_call(call_id)
             
             if result.data:
                 logger.info(f"Updated call: {call_id}")
@@ -97,6 +210,7 @@ class CallsAPI:
                 return None
                 
         except Exception as e:
+            _invalidate_call(call_id)
             logger.error(f"Error updating call {call_id}: {e}")
             return None
     
@@ -125,7 +239,8 @@ class CallsAPI:
             notes: Additional call notes
             
         Returns:
-            True if successful, False otherwise
+            True if the call fields were saved, False otherwise (a failed
+            notes append is logged, not reported)
         """
         try:
             updates = {
@@ -142,16 +257,31 @@ class CallsAPI:
                 updates["qualification_status"] = qualification_status
             if bant_assessment:
                 updates["bant_assessment"] = bant_assessment
-            if notes:
-                # Append to existing notes if any
-                existing_call = self.get_call(call_id)
-                if existing_call and existing_call.get("notes"):
-                    updates["notes"] = f"{existing_call['notes']}\n\n{notes}"
-                else:
-                    updates["notes"] = notes
+            
+            # Once the append_call_note RPC is known to work, the append (a
+            # single UPDATE of `notes`) runs alongside the field update. The
+            # read-then-update fallback must not overlap it, so it runs after.
+            note_future = None
+            if notes and _append_rpc_available:
+                note_future = _io_executor.submit(self._append_note_rpc, call_id, notes)
             
             result = self.update_call(call_id, updates)
             
+            if notes:
+                if note_future is None:
+                    noted = self._append_note(call_id, notes)
+                else:
+                    try:
+                        noted = note_future.result()
+                    except Exception as e:
+                        # Only redo the append if the RPC turned out to be
+                        # missing; after any other error the UPDATE may have
+                        # committed, and a second append would duplicate it
+                        noted = self._append_note(call_id, notes) if is_missing_function(e) else None
+                if noted is None:
+                    # The call itself was ended; only the note is missing
+                    logger.warning(f"Could not append notes to call {call_id}")
+            
             if result:
                 logger.info(f"Ended call: {call_id} (duration: {duration}s, outcome: {outcome}, score: {lead_score})")
                 return True
@@ -172,11 +302,20 @@ class CallsAPI:
         Returns:
             Call data or None if not found
         """
+        cached = _call_cache.get(call_id)
+        if cached is not None:
+            return dict(cached)
+        
+        epoch = _call_cache_epoch
         try:
             result = self.client.table("calls").select("*").eq("id", call_id).execute()
             
             if result.data:
-                return result.data[0]
+                with _call_cache_lock:
+                    # Skip caching if a write happened while we were reading
+                    if epoch == _call_cache_epoch:
+                        _call_cache.set(call_id, result.data[0])
+                return dict(result.data[0])
             else:
                 logger.warning(f"Call not found: {call_id}")
                 return None
@@ -222,7 +361,8 @@ class CallsAPI:
     def list_calls_for_lead(
         self,
         lead_id: str,
-        limit: int = 50
+        limit: int = 50,
+        fields: str = CALL_LIST_FIELDS
     ) -> list:
         """
         List all calls for a lead
@@ -230,12 +370,13 @@ class CallsAPI:
         Args:
             lead_id: Lead ID
             limit: Maximum number of calls to return
+            fields: Comma-separated columns to select ("*" for full records)
             
         Returns:
             List of call records
         """
         try:
-            result = self.client.table("calls").select("*").eq(
+            result = self.client.table("calls").select(fields).eq(
                 "lead_id", lead_id
             ).order("call_start_time", desc=True).limit(limit).execute()
             
@@ -249,7 +390,8 @@ class CallsAPI:
     def list_calls_by_user(
         self,
         user_id: str,
-        limit: int = 50
+        limit: int = 50,
+        fields: str = CALL_LIST_FIELDS
     ) -> list:
         """
         List all calls by a user
@@ -257,12 +399,13 @@ class CallsAPI:
         Args:
             user_id: User ID
             limit: Maximum number of calls to return
+            fields: Comma-separated columns to select ("*" for full records)
             
         Returns:
             List of call records
         """
         try:
-            result = self.client.table("calls").select("*").eq(
+            result = self.client.table("calls").select(fields).eq(
                 "user_id", user_id
             ).order("call_start_time", desc=True).limit(limit).execute()
             
@@ -285,29 +428,16 @@ class CallsAPI:
             Statistics dictionary
         """
         try:
-            query = self.client.table("calls").select("*")
-            
-            if lead_id:
-                query = query.eq("lead_id", lead_id)
-            if user_id:
-                query = query.eq("user_id", user_id)
-            
-            result = query.execute()
-            calls = result.data or []
+            raw = self._call_stats(lead_id=lead_id, user_id=user_id)
             
-            # Calculate statistics
-            total_calls = len(calls)
-            total_duration = sum(call.get("duration", 0) for call in calls if call.get("duration"))
+            total_calls = raw["total_calls"]
+            total_duration = raw["total_duration"]
             avg_duration = total_duration / total_calls if total_calls > 0 else 0
-            
-            # Count by outcome
-            outcomes = {}
-            for call in calls:
-                outcome = call.get("outcome", "unknown")
-                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            outcomes = raw["outcomes"]
+            outcome_counts = Counter(outcomes)  # missing outcomes count as 0
             
             # Calculate success rate (completed calls)
-            completed_calls = outcomes.get("completed", 0) + outcomes.get("qualified", 0)
+            completed_calls = outcome_counts["completed"] + outcome_counts["qualified"]
             success_rate = (completed_calls / total_calls * 100) if total_calls > 0 else 0
             
             stats = {
@@ -332,6 +462,71 @@ class CallsAPI:
                 "error": str(e)
             }
     
+    def _call_stats(
+        self,
+        lead_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        call_types: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Raw call aggregates for the statistics methods
+        
+        Computed server-side by the call_stats RPC
+        (database/calls_optimizations.sql) so only one small JSON object
+        comes back. Falls back to fetching the rows and aggregating here
+        when the function is not installed.
+        
+        Returns:
+            Dict with total_calls, total_duration, outcomes and calls_by_day
+            (last 7 days, oldest first)
+        """
+        try:
+            result = self.client.rpc("call_stats", {
+                "p_lead": lead_id,
+                "p_user": user_id,
+                "p_types": call_types,
+            }).execute()
+            raw = result.data[0] if isinstance(result.data, list) else result.data
+            if raw:
+                return raw
+        except Exception as e:
+            logger.debug(f"call_stats RPC unavailable, aggregating in Python: {e}")
+        
+        query = self.client.table("calls").select("duration,outcome,call_start_time")
+        if lead_id:
+            query = query.eq("lead_id", lead_id)
+        if user_id:
+            query = query.eq("user_id", user_id)
+        if call_types:
+            query = query.in_("call_type", call_types)
+        
+        calls = query.execute().data or []
+        
+        # Duration, outcomes and days in a single pass. Supabase returns UTC
+        # ISO timestamps, so the first 10 characters are the date - no
+        # datetime parsing needed
+        total_duration = 0
+        outcome_counts = Counter()
+        day_counts = Counter()
+        for call in calls:
+            total_duration += call.get("duration") or 0
+            outcome_counts[call.get("outcome") or "unknown"] += 1
+            start_time = call.get("call_start_time")
+            if start_time:
+                day_counts[start_time[:10]] += 1
+        
+        # Calls by day (last 7 days)
+        today = datetime.utcnow().date()
+        days = [(today - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
+        calls_by_day = [{"date": day, "count": day_counts.get(day, 0)} for day in days]
+        
+        return {
+            "total_calls": len(calls),
+            "total_duration": total_duration,
+            "outcomes": dict(outcome_counts),
+            "calls_by_day": calls_by_day,
+        }
+    
     def add_call_note(self, call_id: str, note: str) -> bool:
         """
         Add a note to an existing call
@@ -344,22 +539,71 @@ class CallsAPI:
             True if successful, False otherwise
         """
         try:
-            call = self.get_call(call_id)
-            if not call:
+            result = self._append_note(call_id, note)
+            if not result:
                 logger.error(f"Cannot add note to non-existent call: {call_id}")
                 return False
             
-            # Append note
-            existing_notes = call.get("notes", "")
-            new_notes = f"{existing_notes}\n\n{note}" if existing_notes else note
-            
-            result = self.update_call(call_id, {"notes": new_notes})
-            return result is not None
+            return True
             
         except Exception as e:
             logger.error(f"Error adding note to call {call_id}: {e}")
             return False
     
+    def _append_note(self, call_id: str, note: str) -> Optional[Dict[str, Any]]:
+        """
+        Append a note to a call's notes (blank line between notes)
+        
+        Uses the append_call_note RPC (database/calls_optimizations.sql) to
+        append in a single UPDATE. Falls back to read-then-update only when
+        the function is not installed: after any other RPC error (e.g. a
+        timeout) the UPDATE may already have committed, so the note is not
+        appended a second time.
+        
+        Returns:
+            Updated call record or None if the call was not found or the
+            append failed
+        """
+        if _append_rpc_available is not False:
+            try:
+                return self._append_note_rpc(call_id, note)
+            except Exception as e:
+                if not is_missing_function(e):
+                    logger.error(f"append_call_note failed for call {call_id}: {e}")
+                    return None
+                logger.debug("append_call_note RPC not installed, updating notes directly")
+        
+        # Read the current notes fresh, not from the get_call cache
+        _invalidate_call(call_id)
+        call = self.get_call(call_id)
+        if not call:
+            return None
+        
+        existing_notes = call.get("notes")
+        new_notes = f"{existing_notes}\n\n{note}" if existing_notes else note
+        return self.update_call(call_id, {"notes": new_notes})
+    
+    def _append_note_rpc(self, call_id: str, note: str) -> Optional[Dict[str, Any]]:
+        """
+        Append a note with the append_call_note RPC only (raises on failure)
+        
+        Records whether the function is installed, so end_call knows if the
+        append can safely run in parallel with its field update.
+        """
+        global _append_rpc_available
+        
+        _invalidate_call(call_id)
+        try:
+            result = self.client.rpc("append_call_note", {"p_id": call_id, "p_note": note}).execute()
+        except Exception as e:
+            if is_missing_function(e):
+                _append_rpc_available = False
+            raise
+        
+        _append_rpc_available = True
+        _invalidate_call(call_id)
+        return result.data[0] if result.data else None
+    
     def list_ai_calls(self, limit: int = 50) -> list:
         """
         List all AI calls with lead information for Sales Hub
@@ -371,50 +615,86 @@ class CallsAPI:
             List of AI call records with lead info
         """
         try:
-            # Get AI calls (ai_outbound, ai_inbound) with lead info
-            result = self.client.table("calls").select(
-                "*, leads(id, contact_person, email, lead_score, qualification_status, clients(client_name))"
-            ).in_(
-                "call_type", ["ai_outbound", "ai_inbound", "outbound"]  # Include outbound for backward compatibility
-            ).order("call_start_time", desc=True).limit(limit).execute()
+            try:
+                calls = [call for page in self.iter_ai_calls(limit) for call in page]
+            except Exception as e:
+                logger.debug(f"ai_calls_with_lead view unavailable, using embedded select: {e}")
+                calls = self._list_ai_calls_embedded(limit)
             
-            calls = result.data or []
-            
-            # Transform to match frontend expected format
-            formatted_calls = []
-            for call in calls:
-                lead_data = call.get("leads", {}) or {}
-                client_data = lead_data.get("clients", {}) or {}
-                
-                formatted_calls.append({
-                    "id": call["id"],
-                    "lead_id": call.get("lead_id"),
-                    "duration": call.get("duration", 0) or 0,
-                    "call_type": call.get("call_type"),
-                    "outcome": call.get("outcome"),
-                    "notes": call.get("notes"),
-                    "call_start_time": call.get("call_start_time"),
-                    "created_at": call.get("created_at"),
-                    "transcript": call.get("transcript"),
-                    "lead_score_after": call.get("lead_score_after"),
-                    "qualification_status": call.get("qualification_status"),
-                    "bant_assessment": call.get("bant_assessment"),
-                    "ai_session_id": call.get("ai_session_id"),
-                    "lead": {
-                        "contact_person": lead_data.get("contact_person"),
-                        "company_name": client_data.get("client_name"),
-                        "email": lead_data.get("email"),
-                        "lead_score": lead_data.get("lead_score"),
-                    } if lead_data else None
-                })
-            
-            logger.debug(f"Found {len(formatted_calls)} AI calls")
-            return formatted_calls
+            logger.debug(f"Found {len(calls)} AI calls")
+            return calls
             
         except Exception as e:
             logger.error(f"Error listing AI calls: {e}")
             return []
     
+    def iter_ai_calls(self, limit: int = 50, page_size: int = AI_CALLS_PAGE_SIZE) -> Iterator[list]:
+        """
+        Yield AI calls (newest first) in pages of up to `page_size`
+        
+        Reads the ai_calls_with_lead view (database/calls_optimizations.sql),
+        which already returns the Sales Hub shape, so rows are passed through
+        as-is.
+        
+        Args:
+            limit: Maximum number of calls in total
+            page_size: Calls fetched per request
+        """
+        offset = 0
+        while offset < limit:
+            end = min(offset + page_size, limit) - 1
+            result = self.client.table("ai_calls_with_lead").select("*").order(
+                "call_start_time", desc=True
+            ).order("id").range(offset, end).execute()
+            
+            page = result.data or []
+            if page:
+                yield page
+            if len(page) < end - offset + 1:
+                return
+            offset = end + 1
+    
+    def _list_ai_calls_embedded(self, limit: int) -> list:
+        """list_ai_calls without the view: embedded lead select + reshaping"""
+        # Get AI calls (ai_outbound, ai_inbound) with lead info
+        result = self.client.table("calls").select(
+            f"{AI_CALL_FIELDS}, leads(contact_person, email, lead_score, clients(client_name))"
+        ).in_(
+            "call_type", AI_CALL_TYPES
+        ).order("call_start_time", desc=True).limit(limit).execute()
+        
+        calls = result.data or []
+        
+        # Transform to match frontend expected format
+        formatted_calls = []
+        for call in calls:
+            lead_data = call.get("leads", {}) or {}
+            client_data = lead_data.get("clients", {}) or {}
+            
+            formatted_calls.append({
+                "id": call["id"],
+                "lead_id": call.get("lead_id"),
+                "duration": call.get("duration", 0) or 0,
+                "call_type": call.get("call_type"),
+                "outcome": call.get("outcome"),
+                "notes": call.get("notes"),
+                "call_start_time": call.get("call_start_time"),
+                "created_at": call.get("created_at"),
+                "transcript": call.get("transcript"),
+                "lead_score_after": call.get("lead_score_after"),
+                "qualification_status": call.get("qualification_status"),
+                "bant_assessment": call.get("bant_assessment"),
+                "ai_session_id": call.get("ai_session_id"),
+                "lead": {
+                    "contact_person": lead_data.get("contact_person"),
+                    "company_name": client_data.get("client_name"),
+                    "email": lead_data.get("email"),
+                    "lead_score": lead_data.get("lead_score"),
+                } if lead_data else None
+            })
+        
+        return formatted_calls
+    
     def get_ai_call_statistics(self) -> Dict[str, Any]:
         """
         Get AI call statistics for Sales Hub dashboard
@@ -423,49 +703,26 @@ class CallsAPI:
             Statistics dictionary
         """
         try:
-            # Get AI calls
-            result = self.client.table("calls").select("*").in_(
-                "call_type", ["ai_outbound", "ai_inbound", "outbound"]
-            ).execute()
+            raw = self._call_stats(call_types=AI_CALL_TYPES)
             
-            calls = result.data or []
-            
-            # Calculate statistics
-            total_calls = len(calls)
-            total_duration = sum(call.get("duration", 0) or 0 for call in calls)
+            total_calls = raw["total_calls"]
+            total_duration = raw["total_duration"]
             avg_duration = total_duration / total_calls if total_calls > 0 else 0
-            
-            # Count by outcome
-            outcomes = {}
-            for call in calls:
-                outcome = call.get("outcome", "unknown")
-                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            outcomes = raw["outcomes"]
+            outcome_counts = Counter(outcomes)  # missing outcomes count as 0
             
             # Calculate qualification rate
             qualified_outcomes = ["qualified", "completed"]
-            qualified_calls = sum(outcomes.get(o, 0) for o in qualified_outcomes)
+            qualified_calls = sum(outcome_counts[o] for o in qualified_outcomes)
             qualification_rate = (qualified_calls / total_calls * 100) if total_calls > 0 else 0
             
             # Calculate success rate (calls that completed)
             completed_outcomes = ["completed", "qualified", "follow_up_scheduled"]
-            completed_calls = sum(outcomes.get(o, 0) for o in completed_outcomes)
+            completed_calls = sum(outcome_counts[o] for o in completed_outcomes)
             success_rate = (completed_calls / total_calls * 100) if total_calls > 0 else 0
             
             # Calls by day (last 7 days)
-            from datetime import timedelta
-            calls_by_day = []
-            today = datetime.utcnow().date()
-            for i in range(6, -1, -1):
-                day = today - timedelta(days=i)
-                day_count = sum(
-                    1 for call in calls 
-                    if call.get("call_start_time") and 
-                    datetime.fromisoformat(call["call_start_time"].replace("Z", "+00:00")).date() == day
-                )
-                calls_by_day.append({
-                    "date": day.isoformat(),
-                    "count": day_count
-                })
+            calls_by_day = raw["calls_by_day"]
             
             stats = {
                 "totalCalls": total_calls,
@@ -476,10 +733,10 @@ class CallsAPI:
                 "outcomes": outcomes,
                 "callsByDay": calls_by_day,
                 "qualificationBreakdown": {
-                    "unqualified": outcomes.get("not_interested", 0) + outcomes.get("no_answer", 0),
-                    "marketing_qualified": outcomes.get("completed", 0),
-                    "sales_qualified": outcomes.get("qualified", 0),
-                    "opportunity": outcomes.get("follow_up_scheduled", 0),
+                    "unqualified": outcome_counts["not_interested"] + outcome_counts["no_answer"],
+                    "marketing_qualified": outcome_counts["completed"],
+                    "sales_qualified": outcome_counts["qualified"],
+                    "opportunity": outcome_counts["follow_up_scheduled"],
                 }
             }
             
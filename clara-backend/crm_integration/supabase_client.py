@@ -2,8 +2,10 @@
 Supabase Client Configuration
 """
 
+import httpx
 from supabase import create_client, Client
 from config import settings
+from utils.http_client import client_options
 from utils.logger import get_logger
 from typing import Optional
 
@@ -12,6 +14,12 @@ logger = get_logger("supabase")
 # Global Supabase client instance
 _supabase_client: Optional[Client] = None
 
+# Connection pool for every CRM query (LeadsAPI, CallsAPI, ...). Calls are
+# many small reads/updates, so keep connections warm between requests
+# instead of paying a TLS handshake for each burst.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
 
 def get_supabase_client() -> Client:
     """
@@ -29,10 +37,18 @@ def get_supabase_client() -> Client:
                 raise ValueError("Supabase configuration is incomplete")
             
             # Create client with service role key for full access
-            _supabase_client = create_client(
-                settings.SUPABASE_URL,
-                settings.SUPABASE_SERVICE_KEY
-            )
+            options = client_options(HTTP_LIMITS, HTTP_TIMEOUT)
+            if options is None:
+                _supabase_client = create_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SERVICE_KEY
+                )
+            else:
+                _supabase_client = create_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SERVICE_KEY,
+                    options=options
+                )
             
             logger.info("Supabase client initialized successfully")
             
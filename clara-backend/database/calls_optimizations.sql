@@ -0,0 +1,118 @@
+-- ============================================================================
+-- CALLS API OPTIMIZATIONS (Sales Agent / Sales Hub)
+-- Run this in Supabase SQL Editor after the main schema (calls table)
+-- Safe to run more than once.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 1. CALL STATISTICS (CallsAPI.get_call_statistics / get_ai_call_statistics)
+-- ─────────────────────────────────────────────────────────────────────────
+-- Counts, total duration, per-outcome counts and the last 7 days' call
+-- counts in one small JSON object, instead of downloading every call row
+-- (transcripts included) and aggregating in Python.
+-- Every filter is optional: NULL means "don't filter on this".
+CREATE OR REPLACE FUNCTION call_stats(
+    p_lead UUID DEFAULT NULL,
+    p_user UUID DEFAULT NULL,
+    p_types TEXT[] DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql STABLE
+AS $$
+    WITH filtered AS (
+        SELECT c.duration,
+               coalesce(c.outcome, 'unknown') AS outcome,
+               (c.call_start_time AT TIME ZONE 'UTC')::date AS call_day
+        FROM calls c
+        WHERE (p_lead IS NULL OR c.lead_id = p_lead)
+          AND (p_user IS NULL OR c.user_id = p_user)
+          AND (p_types IS NULL OR c.call_type = ANY (p_types))
+    ),
+    by_outcome AS (
+        SELECT outcome, count(*) AS cnt
+        FROM filtered
+        GROUP BY outcome
+    ),
+    -- Last 7 UTC days (oldest first), zero-filled
+    days AS (
+        SELECT d::date AS day
+        FROM generate_series(
+            (now() AT TIME ZONE 'UTC')::date - 6,
+            (now() AT TIME ZONE 'UTC')::date,
+            interval '1 day'
+        ) AS d
+    ),
+    by_day AS (
+        SELECT days.day, count(f.call_day) AS cnt
+        FROM days
+        LEFT JOIN filtered f ON f.call_day = days.day
+        GROUP BY days.day
+    )
+    SELECT jsonb_build_object(
+        'total_calls', (SELECT count(*) FROM filtered),
+        'total_duration', (SELECT coalesce(sum(duration), 0) FROM filtered),
+        'outcomes', coalesce((SELECT jsonb_object_agg(outcome, cnt) FROM by_outcome), '{}'::jsonb),
+        'calls_by_day', (
+            SELECT jsonb_agg(jsonb_build_object('date', day, 'count', cnt) ORDER BY day)
+            FROM by_day
+        )
+    );
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 2. APPEND A CALL NOTE (CallsAPI.add_call_note / end_call)
+-- ─────────────────────────────────────────────────────────────────────────
+-- Appends in one UPDATE instead of reading the call and writing back the
+-- concatenated notes: one round trip, and two concurrent notes can no
+-- longer overwrite each other. Returns the updated row (none if the call
+-- does not exist).
+CREATE OR REPLACE FUNCTION append_call_note(p_id UUID, p_note TEXT)
+RETURNS SETOF calls
+LANGUAGE sql VOLATILE
+AS $$
+    UPDATE calls
+    SET notes = CASE
+                    WHEN coalesce(notes, '') = '' THEN p_note
+                    ELSE notes || E'\n\n' || p_note
+                END,
+        updated_at = now()
+    WHERE id = p_id
+    RETURNING *;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 3. SALES HUB CALL HISTORY (CallsAPI.list_ai_calls)
+-- ─────────────────────────────────────────────────────────────────────────
+-- AI calls already joined to their lead/client and shaped the way the
+-- Sales Hub expects (`lead` is one flat object, or NULL), so the API can
+-- page through it without rebuilding every row in Python.
+-- security_invoker: the view applies the caller's row-level security.
+CREATE OR REPLACE VIEW ai_calls_with_lead
+WITH (security_invoker = on)
+AS
+SELECT c.id,
+       c.lead_id,
+       coalesce(c.duration, 0) AS duration,
+       c.call_type,
+       c.outcome,
+       c.notes,
+       c.call_start_time,
+       c.created_at,
+       c.transcript,
+       c.lead_score_after,
+       c.qualification_status,
+       c.bant_assessment,
+       c.ai_session_id,
+       CASE WHEN l.id IS NULL THEN NULL ELSE jsonb_build_object(
+           'contact_person', l.contact_person,
+           'company_name', cl.client_name,
+           'email', l.email,
+           'lead_score', l.lead_score
+       ) END AS lead
+FROM calls c
+LEFT JOIN leads l ON l.id = c.lead_id
+LEFT JOIN clients cl ON cl.id = l.client_id
+WHERE c.call_type IN ('ai_outbound', 'ai_inbound', 'outbound');
+
+-- Newest-first pages of one set of call types
+CREATE INDEX IF NOT EXISTS idx_calls_type_start ON calls (call_type, call_start_time DESC);
@@ -0,0 +1,243 @@
+-- ============================================================================
+-- KNOWLEDGE BASE SEARCH OPTIMIZATIONS (Support Agent)
+-- Run this in Supabase SQL Editor after add_support_tables.sql
+-- Safe to run more than once.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 1. INT8 QUANTIZED EMBEDDINGS
+-- ─────────────────────────────────────────────────────────────────────────
+-- build_kb_index also stores each normalized 384-dim embedding as 384 int8
+-- values plus a per-vector scale (x ~= int8 * embedding_scale, with
+-- embedding_scale = max|x| / 127). kb_search's in-process scoring downloads
+-- these instead of the float vectors. Rows without a scale were written
+-- with the old fixed scale of 1/127.
+ALTER TABLE kb_embeddings ADD COLUMN IF NOT EXISTS embedding_int8 BYTEA;
+ALTER TABLE kb_embeddings ADD COLUMN IF NOT EXISTS embedding_scale REAL;
+
+-- Binary codes: the sign of each component packed into 48 bytes. The
+-- Python fallback downloads these together with the int8 vectors into its
+-- cached index, shortlists candidates by Hamming distance on the codes and
+-- rescores the shortlist with the in-memory int8 vectors.
+ALTER TABLE kb_embeddings ADD COLUMN IF NOT EXISTS embedding_bits BYTEA;
+ALTER TABLE kb_embeddings ALTER COLUMN embedding DROP NOT NULL;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 2. FULL-TEXT SEARCH ON KB_ARTICLES
+-- ─────────────────────────────────────────────────────────────────────────
+-- Replaces the ILIKE '%term%' fallback search (a sequential scan of every
+-- article) with a GIN-indexed tsvector lookup.
+ALTER TABLE kb_articles ADD COLUMN IF NOT EXISTS fts TSVECTOR
+    GENERATED ALWAYS AS (
+        to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_kb_articles_fts ON kb_articles USING GIN (fts);
+
+CREATE OR REPLACE FUNCTION kb_fts_search(q TEXT, k INT DEFAULT 5)
+RETURNS TABLE (id UUID, title TEXT, content TEXT, category TEXT, score REAL)
+LANGUAGE sql STABLE
+AS $$
+    SELECT a.id, a.title, a.content, a.category,
+           ts_rank(a.fts, plainto_tsquery('english', q)) AS score
+    FROM kb_articles a
+    WHERE a.fts @@ plainto_tsquery('english', q)
+    ORDER BY score DESC
+    LIMIT k;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 3. HYBRID SEARCH (vector + full-text, reciprocal rank fusion)
+-- ─────────────────────────────────────────────────────────────────────────
+-- One round trip for /api/kb/search: the pgvector kNN leg and the
+-- full-text leg are ranked separately over kb_chunks and fused with
+-- RRF (1 / (rrf_k + rank)). `score` is the cosine similarity of the chunk
+-- (inner product of unit-length vectors).
+ALTER TABLE kb_chunks ADD COLUMN IF NOT EXISTS fts TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_kb_chunks_fts ON kb_chunks USING GIN (fts);
+
+CREATE OR REPLACE FUNCTION kb_hybrid_search(
+    q TEXT,
+    q_embedding VECTOR(384),
+    k INT DEFAULT 5,
+    rrf_k INT DEFAULT 60
+)
+RETURNS TABLE (
+    chunk_id UUID,
+    score DOUBLE PRECISION,
+    content TEXT,
+    article_title TEXT,
+    article_category TEXT
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH vec AS (
+        SELECT e.chunk_id,
+               row_number() OVER (ORDER BY e.embedding <#> q_embedding) AS rank
+        FROM kb_embeddings e
+        WHERE e.embedding IS NOT NULL
+        ORDER BY e.embedding <#> q_embedding
+        LIMIT k * 2
+    ),
+    fts AS (
+        SELECT c.id AS chunk_id,
+               row_number() OVER (
+                   ORDER BY ts_rank(c.fts, plainto_tsquery('english', q)) DESC
+               ) AS rank
+        FROM kb_chunks c
+        WHERE c.fts @@ plainto_tsquery('english', q)
+        ORDER BY ts_rank(c.fts, plainto_tsquery('english', q)) DESC
+        LIMIT k * 2
+    ),
+    fused AS (
+        SELECT coalesce(vec.chunk_id, fts.chunk_id) AS chunk_id,
+               coalesce(1.0 / (rrf_k + vec.rank), 0.0)
+                 + coalesce(1.0 / (rrf_k + fts.rank), 0.0) AS rrf
+        FROM vec
+        FULL OUTER JOIN fts ON fts.chunk_id = vec.chunk_id
+    )
+    SELECT f.chunk_id,
+           coalesce(-(e.embedding <#> q_embedding), 0.0)::DOUBLE PRECISION,
+           c.content,
+           a.title,
+           a.category
+    FROM fused f
+    JOIN kb_chunks c ON c.id = f.chunk_id
+    JOIN kb_articles a ON a.id = c.article_id
+    LEFT JOIN kb_embeddings e ON e.chunk_id = f.chunk_id
+    ORDER BY f.rrf DESC
+    LIMIT k;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 4. CATEGORY COUNTS (GET /api/kb/categories)
+-- ─────────────────────────────────────────────────────────────────────────
+-- Aggregates in Postgres instead of shipping every article's category.
+CREATE OR REPLACE FUNCTION kb_category_counts()
+RETURNS TABLE (category TEXT, n BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT coalesce(a.category, 'general') AS category, count(*) AS n
+    FROM kb_articles a
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 5. KB STATS (GET /api/kb/stats)
+-- ─────────────────────────────────────────────────────────────────────────
+-- Both counts in a single round trip.
+CREATE OR REPLACE FUNCTION kb_stats()
+RETURNS TABLE (articles_count BIGINT, chunks_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT (SELECT count(*) FROM kb_articles),
+           (SELECT count(*) FROM kb_chunks);
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 6. RESET INDEX (build_kb_index.clear_existing_index)
+-- ─────────────────────────────────────────────────────────────────────────
+-- TRUNCATE skips per-row WAL and dead tuples. Nothing references
+-- kb_embeddings, so it can be truncated. kb_chunks cannot: citations.chunk_id
+-- points at it (ON DELETE SET NULL), and TRUNCATE ... CASCADE would wipe
+-- citations. It is deleted normally, after its embeddings are already gone.
+CREATE OR REPLACE FUNCTION kb_reset_index()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE kb_embeddings;
+    DELETE FROM kb_chunks;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION kb_reset_index() TO service_role;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 7. REMOVED: match_kb_chunks
+-- ─────────────────────────────────────────────────────────────────────────
+-- Earlier versions of this script created a chunk-id-only kNN function.
+-- search_kb uses match_kb (section 8) instead, so drop it if present.
+DROP FUNCTION IF EXISTS match_kb_chunks(VECTOR(384), INT);
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 8. TOP-K MATCH WITH CHUNK + ARTICLE DETAILS (kb_search.search_kb)
+-- ─────────────────────────────────────────────────────────────────────────
+-- kNN over kb_embeddings using the inner-product ivfflat index (section
+-- 11), so only the top `k` rows leave the database instead of every
+-- embedding. Stored vectors and the query are unit length, so the inner
+-- product is the cosine similarity. Joined to kb_chunks and kb_articles so
+-- search_kb gets its final rows in one round trip instead of three.
+CREATE OR REPLACE FUNCTION match_kb(
+    query_embedding VECTOR(384),
+    k INT DEFAULT 5
+)
+RETURNS TABLE (
+    chunk_id UUID,
+    score DOUBLE PRECISION,
+    content TEXT,
+    article_title TEXT,
+    article_category TEXT
+)
+LANGUAGE sql STABLE
+SET ivfflat.probes = 10
+AS $$
+    SELECT c.id,
+           (-(e.embedding <#> query_embedding))::DOUBLE PRECISION AS score,
+           c.content,
+           a.title,
+           a.category
+    FROM kb_embeddings e
+    JOIN kb_chunks c ON c.id = e.chunk_id
+    JOIN kb_articles a ON a.id = c.article_id
+    WHERE e.embedding IS NOT NULL
+    ORDER BY e.embedding <#> query_embedding
+    LIMIT k;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 9. INDEX VERSION PROBE (kb_search.fetch_index_version)
+-- ─────────────────────────────────────────────────────────────────────────
+-- The in-process fallback checks whether its cached embedding index is
+-- still current by reading the newest kb_embeddings.created_at. This
+-- index makes that a one-row lookup instead of a scan.
+CREATE INDEX IF NOT EXISTS idx_kb_embeddings_created ON kb_embeddings (created_at DESC);
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 10. STORAGE BUCKET FOR THE PUBLISHED EMBEDDING INDEX
+-- ─────────────────────────────────────────────────────────────────────────
+-- build_kb_index uploads kb_embeddings.npz (chunk ids, int8 vectors,
+-- scales, sign bits as contiguous arrays) here; kb_search downloads it in
+-- one request instead of reading every kb_embeddings row. Private bucket:
+-- only the service role reads and writes it.
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('kb-index', 'kb-index', false)
+ON CONFLICT (id) DO NOTHING;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 11. INNER-PRODUCT VECTOR INDEX
+-- ─────────────────────────────────────────────────────────────────────────
+-- build_kb_index stores L2-normalized embeddings and kb_search normalizes
+-- the query, so cosine distance reduces to the (negative) inner product
+-- `<#>`: no per-row norm computation. Replaces the vector_cosine_ops index
+-- from add_support_tables.sql.
+-- ivfflat picks its clusters when the index is built: after the first full
+-- build_kb_index run, rebuild it once with
+--     REINDEX INDEX kb_embeddings_ip_idx;
+DROP INDEX IF EXISTS kb_embeddings_vector_idx;
+
+CREATE INDEX IF NOT EXISTS kb_embeddings_ip_idx
+    ON kb_embeddings
+    USING ivfflat (embedding vector_ip_ops)
+    WITH (lists = 100);
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 12. UNIQUE ARTICLE TITLES (seed_kb_faqs)
+-- ─────────────────────────────────────────────────────────────────────────
+-- Lets seed_kb_faqs insert every FAQ with one
+-- `INSERT ... ON CONFLICT (title) DO NOTHING` upsert instead of a SELECT +
+-- INSERT per title. Remove duplicate titles first if this fails.
+CREATE UNIQUE INDEX IF NOT EXISTS kb_articles_title_uniq ON kb_articles (title);
@@ -0,0 +1,61 @@
+-- ============================================================================
+-- TICKET API OPTIMIZATIONS (Support Agent)
+-- Run this in Supabase SQL Editor after add_support_tables.sql
+-- Safe to run more than once.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 1. TICKET STATS (GET /api/tickets/stats)
+-- ─────────────────────────────────────────────────────────────────────────
+-- All five dashboard counts from one scan of tickets and one round trip,
+-- instead of five separate count queries.
+CREATE OR REPLACE FUNCTION get_ticket_stats()
+RETURNS TABLE (
+    total_tickets BIGINT,
+    open_tickets BIGINT,
+    resolved_tickets BIGINT,
+    needs_human_review BIGINT,
+    resolved_by_ai BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT count(*),
+           count(*) FILTER (WHERE t.status = 'open'),
+           count(*) FILTER (WHERE t.status = 'resolved'),
+           count(*) FILTER (WHERE t.needs_human_review),
+           count(*) FILTER (WHERE t.status = 'resolved' AND t.needs_human_review = FALSE)
+    FROM tickets t;
+$$;
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 2. INDEXES FOR THE LIST / ESCALATED / HISTORY QUERIES
+-- ─────────────────────────────────────────────────────────────────────────
+-- GET /api/tickets filters on status or priority and orders by created_at
+-- DESC with a LIMIT. With (filter, created_at DESC) indexes Postgres reads
+-- just the first `limit` matching entries instead of sorting every match.
+CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets (status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_tickets_priority_created ON tickets (priority, created_at DESC);
+
+-- GET /api/tickets/escalated: escalated tickets are a small minority, so a
+-- partial index stays small and holds exactly the rows it returns
+CREATE INDEX IF NOT EXISTS idx_tickets_needs_review_created ON tickets (created_at DESC)
+    WHERE needs_human_review = TRUE;
+
+-- GET /api/tickets/{id}/history: one ticket's history, newest first
+CREATE INDEX IF NOT EXISTS idx_ticket_history_ticket_created ON ticket_history (ticket_id, created_at DESC);
+
+-- The single-column indexes from add_support_tables.sql are prefixes of the
+-- ones above; dropping them saves one index update per insert
+DROP INDEX IF EXISTS idx_tickets_status;
+DROP INDEX IF EXISTS idx_tickets_priority;
+DROP INDEX IF EXISTS idx_ticket_history_ticket;
+
+-- customers(email) is already indexed (idx_customers_email), which covers
+-- get_or_create_customer's lookup.
+
+-- ─────────────────────────────────────────────────────────────────────────
+-- 3. ETAG VERSION LOOKUP (GET /api/tickets and /stats)
+-- ─────────────────────────────────────────────────────────────────────────
+-- ticket_api.tickets_etag() reads the newest updated_at (plus the row
+-- count) before serving a list; this makes that an index-only lookup.
+CREATE INDEX IF NOT EXISTS idx_tickets_updated ON tickets (updated_at DESC);
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup: make the backend packages (utils, agents, ...) importable
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# kb_search and build_kb_index create their Supabase client at import. No
+# test talks to the database, so placeholder credentials are enough.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
@@ -0,0 +1,89 @@
+"""
+Tests for agents.support_agent.build_kb_index
+"""
+
+import re
+import types
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from agents.support_agent import build_kb_index  # noqa: E402
+
+
+def _whitespace_tokenizer(text, **kwargs):
+    """One token per whitespace-separated word, with character offsets."""
+    return {"offset_mapping": [m.span() for m in re.finditer(r"\S+", text)]}
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    model = types.SimpleNamespace(tokenizer=_whitespace_tokenizer)
+    monkeypatch.setattr(build_kb_index, "get_model", lambda: model)
+
+
+def test_short_text_is_one_chunk():
+    assert build_kb_index.split_into_chunks("Reset  your\npassword here", max_tokens=10, overlap=2) == [
+        "Reset  your\npassword here"
+    ]
+
+
+def test_windows_overlap_and_cover_every_token():
+    words = [f"w{i}" for i in range(10)]
+    chunks = build_kb_index.split_into_chunks(" ".join(words), max_tokens=4, overlap=1)
+
+    assert chunks == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+
+def test_last_window_is_not_repeated():
+    words = [f"w{i}" for i in range(5)]
+    chunks = build_kb_index.split_into_chunks(" ".join(words), max_tokens=4, overlap=1)
+
+    assert chunks == ["w0 w1 w2 w3", "w3 w4"]
+
+
+def test_empty_text_has_no_chunks():
+    assert build_kb_index.split_into_chunks("   ") == []
+
+
+class _ResetClient:
+    """Supabase client whose kb_reset_index RPC fails with `error`."""
+
+    def __init__(self, error):
+        self.error = error
+        self.deleted = []
+
+    def rpc(self, name):
+        assert name == "kb_reset_index"
+        return self
+
+    def execute(self):
+        raise self.error
+
+    def table(self, name):
+        self.deleted.append(name)
+        return types.SimpleNamespace(
+            delete=lambda: types.SimpleNamespace(
+                neq=lambda column, value: types.SimpleNamespace(execute=lambda: None)
+            )
+        )
+
+
+def test_clear_existing_index_deletes_rows_when_reset_rpc_is_missing(monkeypatch):
+    client = _ResetClient(Exception("PGRST202: Could not find the function public.kb_reset_index"))
+    monkeypatch.setattr(build_kb_index, "supabase", client)
+
+    build_kb_index.clear_existing_index()
+
+    assert client.deleted == ["kb_embeddings", "kb_chunks"]
+
+
+def test_clear_existing_index_raises_other_rpc_errors(monkeypatch):
+    client = _ResetClient(PermissionError("permission denied for table kb_embeddings"))
+    monkeypatch.setattr(build_kb_index, "supabase", client)
+
+    with pytest.raises(PermissionError):
+        build_kb_index.clear_existing_index()
+    assert client.deleted == []
@@ -0,0 +1,200 @@
+"""
+Tests for CallsAPI against an in-memory stand-in for the Supabase client
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("supabase")
+
+from crm_integration import calls_api  # noqa: E402
+from crm_integration.calls_api import CallsAPI  # noqa: E402
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _APIError(Exception):
+    """Shape of postgrest.exceptions.APIError (message + code attributes)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class _FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.values = None
+
+    def select(self, columns):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.client.filters.append(("eq", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.client.filters.append(("in", column, values))
+        return self
+
+    def execute(self):
+        if self.values is None:
+            self.client.selects += 1
+            if self.client.on_select is not None:
+                self.client.on_select()
+            return _Result([dict(row) for row in self.client.rows])
+
+        self.client.updates.append(self.values)
+        self.client.rows[0].update(self.values)
+        return _Result([dict(self.client.rows[0])])
+
+
+class _FakeClient:
+    """Supabase client holding the `calls` rows; RPCs can be made to fail."""
+
+    def __init__(self, rows, rpc_error=None, rpc_commits_before_error=False):
+        self.rows = rows
+        self.rpc_error = rpc_error
+        self.rpc_commits_before_error = rpc_commits_before_error
+        self.filters = []
+        self.updates = []
+        self.selects = 0
+        self.on_select = None
+
+    def rpc(self, name, params):
+        if name == "append_call_note" and (self.rpc_error is None or self.rpc_commits_before_error):
+            row = self.rows[0]
+            row["notes"] = f"{row['notes']}\n\n{params['p_note']}" if row.get("notes") else params["p_note"]
+        if self.rpc_error is not None:
+            raise self.rpc_error
+        if name == "call_stats":
+            raise _APIError("PGRST202", "Could not find the function public.call_stats")
+        return type("Query", (), {"execute": lambda _self: _Result([dict(self.rows[0])])})()
+
+    def table(self, name):
+        assert name == "calls"
+        return _FakeQuery(self)
+
+
+@pytest.fixture(autouse=True)
+def fresh_module_state(monkeypatch):
+    monkeypatch.setattr(calls_api, "_append_rpc_available", None)
+    calls_api._call_cache.clear()
+
+
+def _api(rows, **kwargs):
+    api = CallsAPI.__new__(CallsAPI)
+    api.client = _FakeClient(rows, **kwargs)
+    return api
+
+
+# ── _call_stats fallback ───────────────────────────────────────────────────
+
+def test_call_stats_falls_back_to_python_aggregation():
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+    rows = [
+        {"duration": 60, "outcome": "interested", "call_start_time": f"{today}T10:00:00+00:00"},
+        {"duration": 30, "outcome": "interested", "call_start_time": f"{yesterday}T09:00:00+00:00"},
+        {"duration": None, "outcome": None, "call_start_time": None},
+        {"duration": 15, "outcome": "voicemail", "call_start_time": "2000-01-01T00:00:00+00:00"},
+    ]
+
+    stats = _api(rows)._call_stats()
+
+    assert stats["total_calls"] == 4
+    assert stats["total_duration"] == 105
+    assert stats["outcomes"] == {"interested": 2, "unknown": 1, "voicemail": 1}
+    assert [d["date"] for d in stats["calls_by_day"]] == [
+        (today - timedelta(days=i)).isoformat() for i in range(6, -1, -1)
+    ]
+    assert [d["count"] for d in stats["calls_by_day"]] == [0, 0, 0, 0, 0, 1, 1]
+
+
+def test_call_stats_fallback_applies_filters():
+    api = _api([])
+
+    stats = api._call_stats(lead_id="lead-1", user_id="user-1", call_types=["ai_outbound"])
+
+    assert api.client.filters == [
+        ("eq", "lead_id", "lead-1"),
+        ("eq", "user_id", "user-1"),
+        ("in", "call_type", ["ai_outbound"]),
+    ]
+    assert stats["total_calls"] == 0
+    assert stats["outcomes"] == {}
+
+
+# ── Note appends ───────────────────────────────────────────────────────────
+
+def test_append_note_uses_the_rpc():
+    api = _api([{"id": "c1", "notes": "first"}])
+
+    assert api._append_note("c1", "second")["notes"] == "first\n\nsecond"
+    assert api.client.updates == []
+
+
+def test_append_note_falls_back_when_the_rpc_is_missing():
+    api = _api([{"id": "c1", "notes": "first"}], rpc_error=_APIError("PGRST202", "Could not find the function"))
+
+    assert api._append_note("c1", "second")["notes"] == "first\n\nsecond"
+    assert len(api.client.updates) == 1
+
+
+def test_append_note_is_not_repeated_after_other_rpc_errors():
+    # The UPDATE committed, but the response was lost
+    api = _api(
+        [{"id": "c1", "notes": "first"}],
+        rpc_error=TimeoutError("read timeout"),
+        rpc_commits_before_error=True,
+    )
+
+    assert api._append_note("c1", "second") is None
+    assert api.client.rows[0]["notes"] == "first\n\nsecond"
+    assert api.client.updates == []
+
+
+def test_end_call_reports_the_field_update_when_the_note_fails(monkeypatch):
+    monkeypatch.setattr(calls_api, "_append_rpc_available", True)
+    api = _api(
+        [{"id": "c1", "notes": "first"}],
+        rpc_error=TimeoutError("read timeout"),
+        rpc_commits_before_error=True,
+    )
+
+    assert api.end_call("c1", duration=42, outcome="completed", notes="second") is True
+    assert api.client.rows[0]["duration"] == 42
+    assert api.client.rows[0]["notes"] == "first\n\nsecond"
+    assert [sorted(u) for u in api.client.updates] == [["duration", "outcome", "updated_at"]]
+
+
+# ── get_call cache ─────────────────────────────────────────────────────────
+
+def test_get_call_caches_rows():
+    api = _api([{"id": "c1", "notes": None}])
+
+    api.get_call("c1")
+    api.get_call("c1")
+
+    assert api.client.selects == 1
+
+
+def test_get_call_does_not_cache_a_row_replaced_by_a_concurrent_write():
+    api = _api([{"id": "c1", "outcome": None}])
+    # A write lands after this read was sent but before it returned
+    api.client.on_select = lambda: calls_api._invalidate_call("c1")
+
+    assert api.get_call("c1")["outcome"] is None
+    api.client.on_select = None
+    api.client.rows[0]["outcome"] = "completed"
+
+    assert api.get_call("c1")["outcome"] == "completed"
+    assert api.client.selects == 2
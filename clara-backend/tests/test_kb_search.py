@@ -0,0 +1,81 @@
+"""
+Tests for agents.support_agent.kb_search
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from agents.support_agent import kb_search  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def numpy_kernels(monkeypatch):
+    """Exercise the NumPy code paths whether or not simsimd is installed."""
+    monkeypatch.setattr(kb_search, "simsimd", None)
+
+
+def _unit_rows(n, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_int8_scores_approximate_cosine():
+    rows = _unit_rows(20)
+    q = rows[3]
+    quantized = [kb_search.quantize_vector(row) for row in rows]
+    codes = np.stack([c for c, _ in quantized])
+    scales = np.array([s for _, s in quantized], dtype=np.float32)
+    q_codes, q_scale = kb_search.quantize_vector(q)
+
+    scores = kb_search.int8_scores(codes, scales, q_codes, q_scale)
+
+    np.testing.assert_allclose(scores, rows @ q, atol=0.02)
+    assert int(np.argmax(scores)) == 3
+
+
+def test_hamming_distances_count_differing_bits():
+    bits = np.array([[0b00000000, 0b00000000], [0b11111111, 0b00000001], [0b10100000, 0b00000000]], dtype=np.uint8)
+    q_bits = np.array([0b00000000, 0b00000000], dtype=np.uint8)
+
+    assert kb_search.hamming_distances(bits, q_bits).tolist() == [0, 9, 2]
+
+
+def test_top_k_indices_best_first():
+    scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5], dtype=np.float32)
+    assert kb_search.top_k_indices(scores, 3).tolist() == [1, 3, 4]
+
+
+def test_top_k_indices_keeps_ties_in_index_order():
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1], dtype=np.float32)
+    assert kb_search.top_k_indices(scores, 3).tolist() == [1, 0, 2]
+    assert kb_search.top_k_indices(scores, 5).tolist() == [1, 0, 2, 3, 4]
+
+
+def test_top_k_indices_handles_small_inputs():
+    scores = np.array([0.2, 0.8], dtype=np.float32)
+    assert kb_search.top_k_indices(scores, 10).tolist() == [1, 0]
+    assert kb_search.top_k_indices(scores, 0).tolist() == []
+    assert kb_search.top_k_indices(np.empty(0, dtype=np.float32), 3).tolist() == []
+
+
+def _search_with_match_kb_error(monkeypatch, error):
+    def match_kb_rows(q_vec, top_k):
+        raise error
+
+    monkeypatch.setattr(kb_search, "embed_question", lambda text: np.zeros(384, dtype=np.float32))
+    monkeypatch.setattr(kb_search, "match_kb_rows", match_kb_rows)
+    monkeypatch.setattr(kb_search, "scan_chunk_scores", lambda q_vec, top_k: [])
+    return kb_search.search_kb("reset my password")
+
+
+def test_search_kb_scans_in_python_when_match_kb_is_missing(monkeypatch):
+    assert _search_with_match_kb_error(monkeypatch, Exception("PGRST202: Could not find the function")) == []
+
+
+def test_search_kb_raises_other_match_kb_errors(monkeypatch):
+    with pytest.raises(TimeoutError):
+        _search_with_match_kb_error(monkeypatch, TimeoutError("read timeout"))
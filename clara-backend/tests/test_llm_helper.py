@@ -0,0 +1,42 @@
+"""
+Tests for the async Ollama retry rules in utils.llm_helper
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from utils import llm_helper
+
+
+def _status_error(code):
+    request = httpx.Request("POST", "http://ollama/api/chat")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+def test_connection_errors_and_5xx_are_transient():
+    assert llm_helper._is_transient(httpx.ConnectError("refused"))
+    assert llm_helper._is_transient(httpx.ConnectTimeout("slow connect"))
+    assert llm_helper._is_transient(_status_error(503))
+    assert not llm_helper._is_transient(_status_error(400))
+
+
+def test_read_timeout_is_final_for_non_streaming_calls():
+    assert llm_helper._is_transient(httpx.ReadTimeout("slow"))
+    assert not llm_helper._is_transient(httpx.ReadTimeout("slow"), retry_read_timeout=False)
+
+
+def test_generation_is_not_resubmitted_after_a_read_timeout(monkeypatch):
+    calls = []
+
+    async def post(url, json, timeout):
+        calls.append(timeout)
+        raise httpx.ReadTimeout("still generating")
+
+    monkeypatch.setattr(llm_helper._HTTP, "post", post)
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(llm_helper._call_ollama_async("hi", "system", 0.2))
+
+    assert calls == [llm_helper._OLLAMA_GENERATE_TIMEOUT]
@@ -0,0 +1,79 @@
+"""
+Tests for utils.micro_batcher.MicroBatcher
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from utils.micro_batcher import MicroBatcher
+
+
+def test_results_follow_their_items():
+    batcher = MicroBatcher(lambda items: [i * 2 for i in items], window=0.01, max_batch=8)
+    assert [batcher(i) for i in range(3)] == [0, 2, 4]
+
+
+def test_concurrent_items_share_a_batch():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(list(items)) or items, window=0.2, max_batch=4)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(batcher, range(4)))
+
+    assert results == [0, 1, 2, 3]
+    assert sorted(sum(batches, [])) == [0, 1, 2, 3]
+    assert len(batches) < 4
+
+
+def test_batches_never_exceed_max_batch():
+    sizes = []
+    release = threading.Event()
+
+    def fn(items):
+        release.wait(1)
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(fn, window=0.05, max_batch=3)
+    futures = [batcher.submit(i) for i in range(7)]
+    release.set()
+
+    assert [f.result(timeout=2) for f in futures] == list(range(7))
+    assert max(sizes) <= 3
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def fn(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(fn, window=0.01, max_batch=4)
+    future = batcher.submit("a")
+    with pytest.raises(ValueError, match="boom"):
+        future.result(timeout=2)
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: [], window=0.01, max_batch=4)
+    with pytest.raises(RuntimeError):
+        batcher.submit("a").result(timeout=2)
+
+
+def test_none_result_resolves_futures_to_none():
+    seen = []
+    batcher = MicroBatcher(seen.extend, window=0.01, max_batch=4)
+    assert batcher.submit("row").result(timeout=2) is None
+    assert seen == ["row"]
+
+
+def test_flush_runs_queued_items_in_the_caller():
+    seen = []
+    batcher = MicroBatcher(lambda items: seen.append(list(items)), window=10, max_batch=2)
+    # Queue without starting the worker thread, as if it had not picked them up yet
+    for i in range(5):
+        batcher._queue.put((i, Future()))
+
+    batcher.flush()
+
+    assert seen == [[0, 1], [2, 3], [4]]
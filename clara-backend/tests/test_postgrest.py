@@ -0,0 +1,26 @@
+"""
+Tests for utils.postgrest
+"""
+
+from utils.postgrest import is_missing_function
+
+
+class _APIError(Exception):
+    """Shape of postgrest.exceptions.APIError (message + code attributes)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def test_missing_function_code_is_detected():
+    assert is_missing_function(_APIError("PGRST202", "Could not find the function public.kb_reset_index"))
+
+
+def test_missing_function_code_in_message_is_detected():
+    assert is_missing_function(Exception("{'code': 'PGRST202', 'message': 'Could not find the function'}"))
+
+
+def test_other_errors_are_not_missing_functions():
+    assert not is_missing_function(_APIError("42501", "permission denied"))
+    assert not is_missing_function(TimeoutError("read timeout"))
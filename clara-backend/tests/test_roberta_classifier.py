@@ -0,0 +1,45 @@
+"""
+Tests for choosing the int8 ONNX model in agents.support_agent.roberta_classifier
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from agents.support_agent import roberta_classifier  # noqa: E402
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    onnx_path = tmp_path / "onnx" / "model_int8.onnx"
+    onnx_path.parent.mkdir()
+    monkeypatch.setattr(roberta_classifier, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(roberta_classifier, "ONNX_MODEL_PATH", str(onnx_path))
+    return tmp_path
+
+
+def _touch(path, mtime):
+    path.write_bytes(b"")
+    os.utime(path, (mtime, mtime))
+
+
+def test_no_export_means_no_onnx(model_dir):
+    _touch(model_dir / "model.safetensors", 100)
+    assert not roberta_classifier._onnx_model_is_current()
+
+
+def test_export_newer_than_weights_and_labels_is_used(model_dir):
+    _touch(model_dir / "model.safetensors", 100)
+    _touch(model_dir / "label_classes.txt", 100)
+    _touch(model_dir / "onnx" / "model_int8.onnx", 200)
+    assert roberta_classifier._onnx_model_is_current()
+
+
+@pytest.mark.parametrize("retrained", ["model.safetensors", "pytorch_model.bin", "label_classes.txt"])
+def test_export_older_than_retrained_files_is_skipped(model_dir, retrained):
+    _touch(model_dir / "onnx" / "model_int8.onnx", 200)
+    _touch(model_dir / retrained, 300)
+    assert not roberta_classifier._onnx_model_is_current()
@@ -0,0 +1,26 @@
+"""
+Tests for the pre-split sales agent prompt templates
+"""
+
+from agents.sales_agent.prompts import (
+    LEAD_QUALIFICATION_PROMPT,
+    _split_template,
+    build_lead_qualification_prompt,
+)
+
+
+def test_split_template_splits_in_field_order_and_unescapes_braces():
+    pieces = _split_template('a {x} b {{"k": 1}} {y} c', "x", "y")
+    assert pieces == ("a ", ' b {"k": 1} ', " c")
+
+
+def test_split_template_without_fields_only_unescapes():
+    assert _split_template("{{}}") == ("{}",)
+
+
+def test_build_lead_qualification_prompt_matches_format():
+    history = "User: hi {not a field}\nAgent: hello"
+    latest = "We have a budget of $10k"
+    expected = LEAD_QUALIFICATION_PROMPT.format(conversation_history="HISTORY", latest_message="LATEST")
+    expected = expected.replace("HISTORY", history).replace("LATEST", latest)
+    assert build_lead_qualification_prompt(history, latest) == expected
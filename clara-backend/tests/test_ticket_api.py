@@ -0,0 +1,84 @@
+"""
+Tests for agents.support_agent.ticket_api helpers
+"""
+
+import asyncio
+
+import orjson
+import pytest
+from pydantic import ValidationError
+
+pytest.importorskip("fastapi")
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from agents.support_agent import ticket_api  # noqa: E402
+
+
+class _Writer:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, row):
+        self.rows.append(row)
+
+
+def test_log_history_fills_missing_values_with_the_column_default(monkeypatch):
+    writer = _Writer()
+    monkeypatch.setattr(ticket_api, "_history_writer", writer)
+
+    ticket_api.log_history({"ticket_id": "t1", "action": "created"})
+    ticket_api.log_history({"ticket_id": "t1", "action": "updated", "old_values": {"status": "new"}})
+
+    assert writer.rows == [
+        {"ticket_id": "t1", "action": "created", "old_values": {}, "new_values": {}},
+        {"ticket_id": "t1", "action": "updated", "old_values": {"status": "new"}, "new_values": {}},
+    ]
+
+
+def _ticket_row(**overrides):
+    row = {
+        "id": "t1",
+        "customer_id": "c1",
+        "subject": "Cannot log in",
+        "description": "Password reset mail never arrives",
+        "channel": "email",
+        "category": "technical",
+        "priority": "high",
+        "status": "new",
+        "resolution": None,
+        "needs_human_review": False,
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        "confidence": 0.9,
+        "customers": {"email": "a@example.com", "name": "Ada"},
+    }
+    row.update(overrides)
+    return row
+
+
+def test_ticket_list_response_renders_ticket_responses():
+    response = ticket_api.ticket_list_response([_ticket_row()], headers={"ETag": '"v1"'})
+
+    [ticket] = orjson.loads(response.body)
+    assert ticket["customer_email"] == "a@example.com"
+    assert ticket["confidence"] == 0.9
+    assert response.headers["etag"] == '"v1"'
+
+
+def test_ticket_list_response_validates_rows():
+    with pytest.raises(ValidationError):
+        ticket_api.ticket_list_response([_ticket_row(subject=None)])
+
+
+def test_ticket_messages_render_every_response_field(monkeypatch):
+    async def load_messages(ticket_id):
+        return [{"id": "m1", "ticket_id": ticket_id, "content": "hi"}]
+
+    monkeypatch.setattr(ticket_api, "load_messages", load_messages)
+
+    response = asyncio.run(ticket_api.get_ticket_messages("t1"))
+
+    [message] = orjson.loads(response.body)
+    assert set(message) == set(ticket_api.TicketMessageResponse.model_fields)
+    assert message["sender_name"] == "User"
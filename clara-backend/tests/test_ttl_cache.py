@@ -0,0 +1,90 @@
+"""
+Tests for utils.ttl_cache.TTLCache
+"""
+
+import threading
+import types
+
+import pytest
+
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the cache's monotonic clock with one the test advances."""
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_get_returns_default_when_missing():
+    cache = TTLCache()
+    assert cache.get("missing") is None
+    assert cache.get("missing", 42) == 42
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=5)
+    cache.set("k", "v")
+
+    clock[0] += 4.9
+    assert cache.get("k") == "v"
+
+    clock[0] += 0.2
+    assert cache.get("k", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_set_refreshes_ttl(clock):
+    cache = TTLCache(ttl=5)
+    cache.set("k", 1)
+    clock[0] += 4
+    cache.set("k", 2)
+    clock[0] += 4
+    assert cache.get("k") == 2
+
+
+def test_pop_and_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.pop("a")
+    cache.pop("not-cached")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_concurrent_sets_respect_maxsize():
+    cache = TTLCache(maxsize=50)
+
+    def fill(offset):
+        for i in range(500):
+            cache.set((offset, i), i)
+            len(cache)
+
+    threads = [threading.Thread(target=fill, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache) == 50
@@ -5,6 +5,7 @@ Utilities Module - Shared helper functions
 from .logger import get_logger
 from .validators import validate_email, validate_phone
 from .formatters import format_lead_data, format_response
+from .ttl_cache import TTLCache
 
 __all__ = [
     "get_logger",
@@ -12,5 +13,6 @@ __all__ = [
     "validate_phone",
     "format_lead_data",
     "format_response",
+    "TTLCache",
 ]
 
@@ -0,0 +1,24 @@
+"""
+Pooled httpx client for the Supabase clients
+"""
+
+import importlib.util
+
+import httpx
+
+
+def build_http_client(limits: httpx.Limits, timeout: httpx.Timeout) -> httpx.Client:
+    """httpx client with the given pool limits (HTTP/2 when `h2` is installed)."""
+    http2 = importlib.util.find_spec("h2") is not None
+    return httpx.Client(limits=limits, timeout=timeout, http2=http2)
+
+
+def client_options(limits: httpx.Limits, timeout: httpx.Timeout):
+    """Supabase ClientOptions using a pooled httpx client, or None if this
+    supabase-py version cannot take one (it then uses its own defaults)."""
+    try:
+        from supabase import ClientOptions
+
+        return ClientOptions(httpx_client=build_http_client(limits, timeout))
+    except (ImportError, TypeError):
+        return None
@@ -12,9 +12,19 @@ Usage:
         system_prompt="You are an email marketing expert.",   # optional
         temperature=0.7,                                      # optional
     )
+
+Async endpoints should await `call_llm_async` instead, so the event loop
+keeps serving other requests while the model generates. `stream_llm_async`
+yields the response piece by piece as the model produces it.
 """
 
+import asyncio
+import json
 import os
+import random
+from typing import AsyncIterator
+
+import httpx
 import requests
 from utils.logger import get_logger
 
@@ -29,6 +39,24 @@ _GROQ_MODEL    = os.getenv("GROQ_CHAT_MODEL", "llama-3.3-70b-versatile")
 
 _DEFAULT_SYSTEM = "You are a helpful AI assistant. Be concise and actionable."
 
+# Limits for the async (API) path, so one runaway generation cannot pin a
+# worker: output tokens, context window, and per-phase timeouts. The read
+# timeout is the longest gap allowed between bytes from Ollama.
+_OLLAMA_MAX_TOKENS = int(os.getenv("OLLAMA_MAX_TOKENS", "512"))
+_OLLAMA_NUM_CTX    = 4096
+_OLLAMA_RETRIES    = 3
+
+# A non-streaming call gets no bytes until the whole generation is done, so
+# its read timeout bounds the generation itself (the sync path allows 60s)
+_OLLAMA_GENERATE_TIMEOUT = httpx.Timeout(connect=3.0, read=90.0, write=5.0, pool=2.0)
+
+# Shared async client: keeps the connection to Ollama alive between calls.
+# Close it on app shutdown with `close_async_client()`.
+_HTTP = httpx.AsyncClient(
+    timeout=httpx.Timeout(connect=3.0, read=30.0, write=5.0, pool=2.0),
+    limits=httpx.Limits(max_keepalive_connections=20),
+)
+
 
 # ── Internal helpers ───────────────────────────────────────────────────────────
 
@@ -49,6 +77,93 @@ def _call_ollama(prompt: str, system_prompt: str, temperature: float) -> str:
     return data.get("message", {}).get("content", "").strip()
 
 
+def _ollama_async_payload(prompt: str, system_prompt: str, temperature: float, stream: bool) -> dict:
+    """Chat payload for the async path, with bounded output and context."""
+    return {
+        "model": _OLLAMA_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user",   "content": prompt},
+        ],
+        "stream":  stream,
+        "options": {
+            "temperature": temperature,
+            "num_predict": _OLLAMA_MAX_TOKENS,
+            "num_ctx": _OLLAMA_NUM_CTX,
+        },
+    }
+
+
+def _is_transient(error: Exception, retry_read_timeout: bool = True) -> bool:
+    """Errors worth retrying: timeouts, refused connections, and 5xx replies.
+
+    With `retry_read_timeout=False` a read timeout is final: the server got
+    the request and is still generating, so a retry would only queue a
+    second copy of the same generation.
+    """
+    if isinstance(error, httpx.ReadTimeout):
+        return retry_read_timeout
+    if isinstance(error, (httpx.TimeoutException, httpx.ConnectError)):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+
+
+async def _backoff(attempt: int) -> None:
+    """Sleep 1s, 2s, 4s... (capped at 8s) plus up to 1s of jitter."""
+    await asyncio.sleep(min(8.0, 2.0 ** attempt) + random.random())
+
+
+async def _call_ollama_async(prompt: str, system_prompt: str, temperature: float) -> str:
+    """Same as `_call_ollama`, but awaits the response instead of blocking.
+
+    Connection failures and 5xx replies are retried up to `_OLLAMA_RETRIES`
+    attempts in total; a read timeout is not (see _is_transient).
+    """
+    payload = _ollama_async_payload(prompt, system_prompt, temperature, stream=False)
+    for attempt in range(_OLLAMA_RETRIES):
+        try:
+            resp = await _HTTP.post(_OLLAMA_URL, json=payload, timeout=_OLLAMA_GENERATE_TIMEOUT)
+            resp.raise_for_status()
+            data = resp.json()
+            return data.get("message", {}).get("content", "").strip()
+        except Exception as e:
+            if not _is_transient(e, retry_read_timeout=False) or attempt == _OLLAMA_RETRIES - 1:
+                raise
+            logger.warning(f"Ollama attempt {attempt + 1} failed ({e}) — retrying.")
+            await _backoff(attempt)
+
+
+async def _stream_ollama_async(prompt: str, system_prompt: str, temperature: float) -> AsyncIterator[str]:
+    """Stream a chat completion from Ollama, yielding text pieces.
+
+    With `stream: true` Ollama sends one JSON object per line, each holding
+    the next piece in `message.content`; the last one has `done: true`.
+    Transient failures are retried only until the first piece is sent.
+    """
+    payload = _ollama_async_payload(prompt, system_prompt, temperature, stream=True)
+    for attempt in range(_OLLAMA_RETRIES):
+        sent_any = False
+        try:
+            async with _HTTP.stream("POST", _OLLAMA_URL, json=payload) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    piece = data.get("message", {}).get("content", "")
+                    if piece:
+                        sent_any = True
+                        yield piece
+                    if data.get("done"):
+                        return
+            return
+        except Exception as e:
+            if sent_any or not _is_transient(e) or attempt == _OLLAMA_RETRIES - 1:
+                raise
+            logger.warning(f"Ollama stream attempt {attempt + 1} failed ({e}) — retrying.")
+            await _backoff(attempt)
+
+
 def _call_groq(prompt: str, system_prompt: str, temperature: float) -> str:
     """Groq cloud API call (OpenAI-compatible)."""
     if not _GROQ_KEY:
@@ -115,3 +230,95 @@ def call_llm(
     except Exception as e:
         logger.error(f"Groq fallback also failed: {e}")
         return ""
+
+
+async def call_llm_async(
+    prompt: str,
+    system_prompt: str = None,
+    temperature: float = 0.7,
+) -> str:
+    """
+    Async version of `call_llm` for FastAPI endpoints.
+
+    Ollama is called through the shared httpx client; the Groq SDK is
+    synchronous, so it runs in a worker thread.
+
+    Returns the model's text response, or "" on total failure.
+    """
+    if system_prompt is None:
+        system_prompt = _DEFAULT_SYSTEM
+
+    # ── Production: Groq only ──────────────────────────────────────────────────
+    if _ENVIRONMENT == "production":
+        try:
+            result = await asyncio.to_thread(_call_groq, prompt, system_prompt, temperature)
+            logger.debug("LLM: Groq responded (production mode)")
+            return result
+        except Exception as e:
+            logger.error(f"Groq call failed in production: {e}")
+            return ""
+
+    # ── Development: Ollama → Groq fallback ───────────────────────────────────
+    try:
+        result = await _call_ollama_async(prompt, system_prompt, temperature)
+        logger.debug(f"LLM: Ollama responded (model={_OLLAMA_MODEL})")
+        return result
+    except httpx.ConnectError:
+        logger.warning("Ollama unreachable — falling back to Groq.")
+    except httpx.TimeoutException:
+        logger.warning("Ollama timed out — falling back to Groq.")
+    except Exception as e:
+        logger.warning(f"Ollama error ({e}) — falling back to Groq.")
+
+    # Groq fallback
+    try:
+        result = await asyncio.to_thread(_call_groq, prompt, system_prompt, temperature)
+        logger.debug("LLM: Groq fallback responded (development mode)")
+        return result
+    except Exception as e:
+        logger.error(f"Groq fallback also failed: {e}")
+        return ""
+
+
+async def stream_llm_async(
+    prompt: str,
+    system_prompt: str = None,
+    temperature: float = 0.7,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of `call_llm_async`: yields text pieces as they arrive.
+
+    Development streams from Ollama. If Ollama fails before sending anything,
+    or in production, the full Groq answer is yielded as a single piece.
+    Yields nothing on total failure.
+    """
+    if system_prompt is None:
+        system_prompt = _DEFAULT_SYSTEM
+
+    if _ENVIRONMENT != "production":
+        sent_any = False
+        try:
+            async for piece in _stream_ollama_async(prompt, system_prompt, temperature):
+                sent_any = True
+                yield piece
+            logger.debug(f"LLM: Ollama stream finished (model={_OLLAMA_MODEL})")
+            return
+        except Exception as e:
+            if sent_any:
+                # Part of the answer is already out; don't mix in a second model
+                logger.error(f"Ollama stream broke off: {e}")
+                return
+            logger.warning(f"Ollama error ({e}) — falling back to Groq.")
+
+    try:
+        result = await asyncio.to_thread(_call_groq, prompt, system_prompt, temperature)
+        logger.debug("LLM: Groq responded (streaming fallback)")
+        if result:
+            yield result
+    except Exception as e:
+        logger.error(f"Groq call failed: {e}")
+
+
+async def close_async_client() -> None:
+    """Close the shared httpx client (call from the app's shutdown hook)."""
+    await _HTTP.aclose()
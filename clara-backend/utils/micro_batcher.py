@@ -0,0 +1,97 @@
+"""
+Thread-based micro-batching
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class MicroBatcher:
+    """Groups items submitted from many threads into batches for one call.
+
+    A daemon thread waits for the first item, then keeps collecting until
+    `window` seconds have passed or `max_batch` items are queued, and calls
+    `fn` once with the whole list. `fn` returns one result per item (in
+    order), or None when there is nothing to hand back. Each item gets a
+    Future that resolves to its result, or to `fn`'s exception for the
+    whole batch.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Optional[Sequence[Any]]],
+        window: float,
+        max_batch: int,
+        name: str = "micro-batcher",
+    ):
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        """Queue `item`; the returned Future resolves once its batch has run."""
+        future: Future = Future()
+        self._queue.put((item, future))
+        self._ensure_worker()
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Queue `item` and block until its result is ready."""
+        return self.submit(item).result()
+
+    def flush(self) -> None:
+        """Run whatever is queued right now in the calling thread (used on shutdown)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.max_batch):
+            self._process(batch[start:start + self.max_batch])
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[Tuple[Any, Future]]) -> None:
+        if not batch:
+            return
+        try:
+            results = self.fn([item for item, _ in batch])
+            if results is None:
+                results = [None] * len(batch)
+            elif len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
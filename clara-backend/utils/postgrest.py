@@ -0,0 +1,18 @@
+"""
+PostgREST error helpers
+"""
+
+# PostgREST's code for "function not found in the schema cache": the SQL
+# file that defines an RPC has not been run on this database yet
+MISSING_FUNCTION_CODE = "PGRST202"
+
+
+def is_missing_function(error: Exception) -> bool:
+    """True if `error` says the called RPC does not exist.
+
+    Callers fall back to their pre-RPC code path only in this case; any
+    other error (timeouts, auth, a failed statement) is not a reason to
+    redo the work another way.
+    """
+    code = getattr(error, "code", None)
+    return code == MISSING_FUNCTION_CODE or MISSING_FUNCTION_CODE in str(error)
@@ -0,0 +1,37 @@
+"""
+Process-wide thread settings for PyTorch inference
+"""
+
+import os
+
+# Intra-op threads per API process (TORCH_NUM_THREADS, default 1)
+INFERENCE_THREADS = int(os.getenv("TORCH_NUM_THREADS", "1"))
+
+
+def configure_inference_threads(num_threads: int | None = None) -> int:
+    """Share one small torch thread pool across every model in the process.
+
+    kb_search and roberta_classifier load models into the same API process.
+    By default each torch op may spread over every core, so a few parallel
+    requests oversubscribe the CPU and latency spikes. With one intra-op
+    thread per request, concurrency comes from the web server's workers.
+
+    This only calls torch.set_num_threads(): OMP_NUM_THREADS/MKL_NUM_THREADS
+    are read when torch is first imported, which has already happened by the
+    time the model modules call this.
+
+    Batch scripts (e.g. build_kb_index) can pass a larger `num_threads`.
+    Returns the thread count that was applied.
+    """
+    n = max(1, num_threads or INFERENCE_THREADS)
+
+    import torch
+
+    torch.set_num_threads(n)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once, before any inter-op work has started
+        pass
+
+    return n